@@ -26,7 +26,7 @@
 import logging
 import warnings
 
-from aiomwclient.client import Site, __version__  # noqa: F401
+from aiomwclient.client import Site, create_connector, __version__  # noqa: F401
 from aiomwclient.errors import *  # noqa: F401, F403
 
 # Show DeprecationWarning
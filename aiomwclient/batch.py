@@ -0,0 +1,112 @@
+import asyncio
+import logging
+
+log = logging.getLogger(__name__)
+
+
+class PageLoader(object):
+    """
+    Collects page info lookups made at about the same time and sends them together
+    as `titles=A|B|...` (or `pageids=...`) queries, in batches of 50 titles, or 500
+    if the user has the `apihighlimits` right. Each lookup gets the info of its own
+    page back.
+    Examples:
+        >>> loader = PageLoader(site)
+        >>> infos = await asyncio.gather(
+        ...     loader.load('Foo'), loader.load('Bar'), loader.load('Baz')
+        ... )  # One request
+    Args:
+        site (Site): The site to query.
+        window (float): The number of seconds to wait for more lookups before
+            sending a batch. With 0, lookups made before the event loop gets to run
+            again are batched.
+    Attributes:
+        site (Site): The site to query.
+        window (float): The number of seconds to wait for more lookups.
+    """
+
+    def __init__(self, site, window=0):
+        self.site = site
+        self.window = window
+        self._batches = {}
+        self._tasks = set()
+
+    async def load(self, name, prop="info", extra_props=()):
+        """
+        Looks up the info of a page.
+        Args:
+            name (Union[str, int]): The page title or page id.
+            prop (str): The `prop` parameter of the query.
+            extra_props (Iterable[tuple]): Additional query parameters, as pairs.
+                Lookups are only batched with others using the same parameters.
+        Returns:
+            dict: The page info, or None if the page could not be told apart in the
+            response, in which case it should be looked up on its own.
+        """
+        key = (prop, tuple(extra_props))
+        loop = asyncio.get_event_loop()
+        batch = self._batches.get(key)
+        if batch is None:
+            batch = self._batches[key] = {}
+            if self.window:
+                loop.call_later(self.window, self._flush, key)
+            else:
+                loop.call_soon(self._flush, key)
+
+        future = batch.get(name)
+        if future is None:
+            future = batch[name] = loop.create_future()
+        # Several lookups of the same page share the future
+        return await asyncio.shield(future)
+
+    def _flush(self, key):
+        batch = self._batches.pop(key)
+        task = asyncio.ensure_future(self._send(key, batch))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _send(self, key, batch):
+        size = 500 if "apihighlimits" in self.site.rights else 50
+        titles = [name for name in batch if type(name) is not int]
+        pageids = [name for name in batch if type(name) is int]
+        chunks = [
+            ("titles", titles[i : i + size]) for i in range(0, len(titles), size)
+        ] + [("pageids", pageids[i : i + size]) for i in range(0, len(pageids), size)]
+        await asyncio.gather(
+            *[self._send_chunk(key, kind, names, batch) for kind, names in chunks]
+        )
+
+    async def _send_chunk(self, key, kind, names, batch):
+        prop, extra_props = key
+        futures = [batch[name] for name in names]
+        log.debug("Looking up %d pages in one query", len(names))
+        try:
+            pages, query = await self.site.query_pages(
+                prop=prop,
+                inprop="protection",
+                *extra_props,
+                **{kind: "|".join(str(name) for name in names)}
+            )
+        except Exception as e:
+            for future in futures:
+                if not future.done():
+                    future.set_exception(e)
+            return
+
+        if kind == "pageids":
+            found = {page.get("pageid"): page for page in pages}
+        else:
+            found = {page.get("title"): page for page in pages}
+            # Map the requested titles to the ones in the response
+            renamed = {}
+            for member in ("normalized", "converted"):
+                for item in query.get(member, ()):
+                    renamed[item["from"]] = item["to"]
+        for name, future in zip(names, futures):
+            if future.done():
+                continue
+            if kind == "titles":
+                # A title can be both normalized and converted
+                name = renamed.get(name, name)
+                name = renamed.get(name, name)
+            future.set_result(found.get(name))
@@ -0,0 +1,84 @@
+import collections
+import logging
+import sys
+
+log = logging.getLogger(__name__)
+
+
+class TextCache(object):
+    """
+    A least recently used cache of page texts, shared by all pages of a site. The
+    texts are keyed by revision id, slot, section and expandtemplates, and stored
+    with the timestamp of their revision. Revisions never change, so the entries
+    stay valid and any page object reading the same revision can reuse them. The
+    oldest entries are evicted once the texts take up more than `max_size` bytes
+    of memory.
+    Examples:
+        >>> cache = TextCache(64 * 1024 * 1024)
+        >>> cache.set((1234, 'main', None, False), 'Some text', timestamp)
+        >>> cache.get((1234, 'main', None, False))
+        ('Some text', timestamp)
+    Args:
+        max_size (int): The maximum total size of the texts, in bytes.
+    Attributes:
+        max_size (int): The maximum total size of the texts, in bytes.
+        size (int): The current total size of the texts, in bytes.
+        hits (int): The number of lookups that found a text.
+        misses (int): The number of lookups that did not.
+    """
+
+    def __init__(self, max_size):
+        self.max_size = max_size
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self._texts = collections.OrderedDict()
+
+    def __len__(self):
+        return len(self._texts)
+
+    def get(self, key):
+        """
+        Looks up a text, marking it as recently used.
+        Args:
+            key (tuple): The revision id, slot, section and expandtemplates.
+        Returns:
+            tuple: The text and the timestamp of its revision, or None if the text
+            is not in the cache.
+        """
+        entry = self._texts.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        self._texts.move_to_end(key)
+        return entry
+
+    def set(self, key, text, timestamp=None):
+        """
+        Adds a text, evicting the least recently used texts if needed. Texts
+        larger than the whole cache are not added.
+        Args:
+            key (tuple): The revision id, slot, section and expandtemplates.
+            text (str): The text.
+            timestamp (time.struct_time): The timestamp of the revision.
+        """
+        size = sys.getsizeof(text)
+        if size > self.max_size:
+            return
+        old = self._texts.pop(key, None)
+        if old is not None:
+            self.size -= sys.getsizeof(old[0])
+        self._texts[key] = (text, timestamp)
+        self.size += size
+        while self.size > self.max_size:
+            _, (evicted, _) = self._texts.popitem(last=False)
+            self.size -= sys.getsizeof(evicted)
+        log.debug("Text cache holds %d texts, %d bytes", len(self._texts), self.size)
+
+    def clear(self):
+        """
+        Removes all texts. The counters are kept.
+        """
+        self._texts.clear()
+        self.size = 0
@@ -1,9 +1,12 @@
 # encoding=utf-8
-import json
+import asyncio
+import collections
 import logging
 import ssl
+import time
 import warnings
-from collections import OrderedDict
+from contextlib import asynccontextmanager
+from urllib.parse import urlencode
 
 # import requests
 # from requests.auth import AuthBase, HTTPBasicAuth
@@ -11,9 +14,21 @@ from collections import OrderedDict
 import aiohttp
 
 import aiomwclient.errors as errors
+from aiomwclient.batch import PageLoader
+from aiomwclient.cache import TextCache
 import aiomwclient.listing as listing
 from aiomwclient.sleep import Sleepers
-from aiomwclient.util import parse_timestamp, read_in_chunks
+from aiomwclient.throttle import AIMDController, Gate, Throttle
+from aiomwclient.util import (
+    content_value,
+    iter_json_members,
+    iter_pages,
+    merge_page,
+    json_decoder,
+    parse_retry_after,
+    parse_timestamp,
+    read_in_chunks,
+)
 
 __version__ = "0.0.1"
 
@@ -24,6 +39,50 @@ USER_AGENT = "mwclient/{} ({})".format(
 )
 
 
+def create_connector(
+    limit=100,
+    limit_per_host=0,
+    keepalive_timeout=15,
+    dns_cache_ttl=10,
+    ssl_context=None,
+):
+    """Create a connection pool that can be shared between several Site objects.
+
+    Pass the result as the `connector` argument of `Site.init` to let multiple
+    sites reuse the same warm connections. The connector is not closed by
+    `Site.close`, so close it yourself once all sites are done with it.
+
+    Example:
+
+        >>> connector = aiomwclient.client.create_connector(limit_per_host=10)
+        >>> en = await aiomwclient.Site().init('en.wikipedia.org', connector=connector)
+        >>> de = await aiomwclient.Site().init('de.wikipedia.org', connector=connector)
+
+    Args:
+        limit (int): Maximum number of simultaneous connections, 0 for no limit.
+        limit_per_host (int): Maximum number of simultaneous connections to a single
+            host, 0 for no limit.
+        keepalive_timeout (float): Seconds an idle connection is kept open for reuse.
+        dns_cache_ttl (int): Seconds to cache DNS lookups for. None caches them
+            forever, 0 disables the cache.
+        ssl_context (ssl.SSLContext): TLS context shared by all connections in the
+            pool. A default context is created if not given.
+
+    Returns:
+        aiohttp.TCPConnector
+    """
+    if ssl_context is None:
+        ssl_context = ssl.create_default_context()
+    return aiohttp.TCPConnector(
+        limit=limit,
+        limit_per_host=limit_per_host,
+        keepalive_timeout=keepalive_timeout,
+        use_dns_cache=dns_cache_ttl != 0,
+        ttl_dns_cache=dns_cache_ttl,
+        ssl=ssl_context,
+    )
+
+
 class Site(object):
     """A MediaWiki site identified by its hostname.
 
@@ -41,6 +100,66 @@ class Site(object):
         >>> site = aiomwclient.Site('vim.wikia.com', path='/')
         >>> site = aiomwclient.Site('sourceforge.net', path='/apps/mediawiki/mwclient/')
 
+    By default every Site opens its own connection pool, sized by `pool_limit`,
+    `pool_limit_per_host`, `keepalive_timeout` and `dns_cache_ttl`. Several sites can
+    share one warm pool by passing the same `connector` (see `create_connector`)
+    or the same `connection` (an `aiohttp.ClientSession`) to `init`.
+
+    Requests can be limited with `max_concurrency` (requests in flight) and
+    `rate_limit` (requests per second) for reads, and `max_write_concurrency` and
+    `write_rate_limit` for writes. All limits are unset by default. With
+    `adaptive_concurrency`, the limits on requests in flight are instead adjusted
+    automatically from response times, errors and replication lag, up to
+    `max_concurrency` and `max_write_concurrency` (64 if unset).
+
+    All API and index.php calls send `maxlag`. When the server reports replication
+    lag, every request to the site waits for the advertised time, after which traffic
+    ramps back up over `lag_ramp_time` seconds.
+
+    With `respect_retry_after`, HTTP 429 and 503 responses are retried instead of
+    raising, and their Retry-After header cools down the whole site in the same way.
+    Retries can use an `aiomwclient.sleep.ExponentialBackoff` as `backoff` instead of
+    the linear `retry_timeout` schedule, and an `aiomwclient.sleep.RetryBudget` as
+    `retry_budget` to cap retries across all concurrent requests.
+
+    API responses are decoded into plain dicts, with orjson if it is installed. Pass
+    `ordered_json=True` to get OrderedDicts instead, or any function decoding bytes
+    as `json_loads`. Responses of `json_offload_threshold` bytes or more are decoded
+    in `json_executor` if one is given, so they don't block other requests. JSON
+    decoders hold the GIL, so use a `concurrent.futures.ProcessPoolExecutor` and a
+    picklable `json_loads` for the event loop to actually keep running.
+
+    With `stream_lists`, listings parse their items incrementally while each
+    response is being received (see `stream_api`), which requires ijson.
+
+    Pass `formatversion=2` to request the more compact JSON format of MediaWiki
+    1.25+ for all API calls. Raw responses from `api` then have that format too:
+    `pages` is a list, content is no longer under "*" and booleans are true/false.
+
+    With `batch_lookups`, pages, images and categories created without info at
+    about the same time (within `batch_window` seconds, or the same event loop
+    iteration) are looked up together in a single query per 50 titles.
+
+    The `field_profile` chooses how much is fetched along with each request. The
+    "default" profile describes files in listings and page lookups with their
+    metadata, and asks for the user's block and message status on every query. The
+    "minimal" profile leaves file info out until it is needed (see
+    `Image.load_imageinfo`) and refreshes the user status at most every
+    `userinfo_interval` seconds. The "full" profile adds the MIME type and the
+    extended metadata of files. Listings can override the profile of the site.
+
+    The `timestamps` of listing items are converted to struct_time by default. They
+    can instead be converted to datetime or epoch seconds, left as strings with
+    "raw", or converted when first read with "lazy", see `listing.List`. The
+    revisions read by `Page.text` keep struct_time, which `Page.edit` relies on.
+
+    With `lazy_pages`, generator listings yield compact `page.LazyPage` objects,
+    which only become full page objects when needed.
+
+    With a `text_cache_size` in bytes, the texts read with `Page.text` are kept in a
+    `cache.TextCache` shared by all pages of the site, as `text_cache`, so pages at
+    the same revision are only fetched once.
+
     """
 
     api_limit = 500
@@ -63,6 +182,34 @@ class Site(object):
         client_certificate=None,
         custom_headers=None,
         scheme="https",
+        connection=None,
+        connector=None,
+        pool_limit=100,
+        pool_limit_per_host=0,
+        keepalive_timeout=15,
+        dns_cache_ttl=10,
+        max_concurrency=None,
+        rate_limit=None,
+        max_write_concurrency=None,
+        write_rate_limit=None,
+        lag_ramp_time=5,
+        respect_retry_after=False,
+        backoff=None,
+        retry_budget=None,
+        adaptive_concurrency=False,
+        json_loads=None,
+        ordered_json=False,
+        json_executor=None,
+        json_offload_threshold=1048576,
+        stream_lists=False,
+        formatversion=1,
+        batch_lookups=False,
+        batch_window=0,
+        field_profile="default",
+        userinfo_interval=300,
+        timestamps="struct_time",
+        lazy_pages=False,
+        text_cache_size=0,
     ) -> "Site":
         # Setup member variables
         self.host = host
@@ -70,7 +217,7 @@ class Site(object):
         self.ext = ext
         self.credentials = None
         self.compress = compress
-        self.max_lag = str(max_lag)
+        self.max_lag = str(max_lag) if max_lag is not None else None
         self.force_login = force_login
         self.requests = reqs or {}
         self.scheme = scheme
@@ -89,17 +236,57 @@ class Site(object):
                 "Authentication is not a tuple or an instance of AuthBase"
             )
 
-        self.sleepers = Sleepers(max_retries, retry_timeout, wait_callback)
+        self.respect_retry_after = respect_retry_after
+        self.json_loads = json_loads or json_decoder(ordered_json)
+        self.json_executor = json_executor
+        self.json_offload_threshold = json_offload_threshold
+        self.stream_lists = stream_lists
+        self.formatversion = formatversion
+        self.page_loader = PageLoader(self, batch_window) if batch_lookups else None
+        if field_profile not in listing.FIELD_PROFILES:
+            raise ValueError("Unknown field profile: %s" % field_profile)
+        self.field_profile = field_profile
+        self.userinfo_interval = userinfo_interval
+        if timestamps not in listing.TIMESTAMP_FORMATS:
+            raise ValueError("Unknown timestamp format: %s" % timestamps)
+        self.timestamps = timestamps
+        self.lazy_pages = lazy_pages
+        self.text_cache = TextCache(text_cache_size) if text_cache_size else None
+        self._userinfo_time = None
+        self.sleepers = Sleepers(
+            max_retries, retry_timeout, wait_callback, backoff, retry_budget
+        )
+
+        # Limits on requests in flight and requests per second. Writes (requests
+        # carrying a token) are throttled separately from reads.
+        self.read_throttle = Throttle(max_concurrency, rate_limit)
+        self.write_throttle = Throttle(max_write_concurrency, write_rate_limit)
+        if adaptive_concurrency:
+            self.read_throttle.controller = AIMDController(
+                self.read_throttle, max_limit=max_concurrency or 64
+            )
+            self.write_throttle.controller = AIMDController(
+                self.write_throttle, max_limit=max_write_concurrency or 64
+            )
+
+        # Paused for every request when the server reports replication lag or
+        # asks us to back off
+        self.gate = Gate(lag_ramp_time)
 
         # Site properties
         self.blocked = False  # Whether current user is blocked
         self.hasmsg = False  # Whether current user has new messages
+        self.logged_in = False  # Whether the current user is logged in
         self.groups = []  # Groups current user belongs to
         self.rights = []  # Rights current user has
         self.tokens = {}  # Edit tokens of the current user
         self.version = None
 
         self.namespaces = self.default_namespaces
+        self.namespace_aliases = {}  # Alias names of namespaces, by name
+        self.namespace_cases = {}  # Case rule of each namespace, by id
+        self._namespace_lookup = self.build_namespace_lookup(self.namespaces)
+        self._titles = collections.OrderedDict()  # Memo of normalize_title
         self.writeapi = False
 
         # Setup connection
@@ -113,7 +300,33 @@ class Site(object):
             headers.update(custom_headers)
 
         # auth = OAuth1(consumer_token, consumer_secret, access_token, access_secret)
-        self.connection = aiohttp.ClientSession(headers=headers, auth=auth)
+        if connection is not None:
+            # A shared session has no per-site defaults, so headers and auth
+            # are sent along with every request instead.
+            self.connection = connection
+            self._owns_connection = False
+            self._headers = headers
+            self._auth = auth
+        else:
+            if connector is None:
+                connector = create_connector(
+                    limit=pool_limit,
+                    limit_per_host=pool_limit_per_host,
+                    keepalive_timeout=keepalive_timeout,
+                    dns_cache_ttl=dns_cache_ttl,
+                )
+                connector_owner = True
+            else:
+                connector_owner = False
+            self.connection = aiohttp.ClientSession(
+                headers=headers,
+                auth=auth,
+                connector=connector,
+                connector_owner=connector_owner,
+            )
+            self._owns_connection = True
+            self._headers = {}
+            self._auth = None
 
         if client_certificate:
             # self.connection.cert = client_certificate
@@ -171,7 +384,7 @@ class Site(object):
         meta = await self.get(
             "query",
             meta="siteinfo|userinfo",
-            siprop="general|namespaces",
+            siprop="general|namespaces|namespacealiases",
             uiprop="groups|rights",
             retry_on_error=False,
         )
@@ -179,9 +392,26 @@ class Site(object):
         # Extract site info
         self.site = meta["query"]["general"]
         self.namespaces = {
-            namespace["id"]: namespace.get("*", "")
+            namespace["id"]: namespace.get("name", namespace.get("*", ""))
+            for namespace in iter(meta["query"]["namespaces"].values())
+        }
+        self.namespace_cases = {
+            namespace["id"]: namespace.get("case", "first-letter")
+            for namespace in iter(meta["query"]["namespaces"].values())
+        }
+        self.namespace_aliases = {
+            alias.get("alias", alias.get("*", "")): alias["id"]
+            for alias in meta["query"].get("namespacealiases", ())
+        }
+        canonical = {
+            namespace["id"]: namespace["canonical"]
             for namespace in iter(meta["query"]["namespaces"].values())
+            if "canonical" in namespace
         }
+        self._namespace_lookup = self.build_namespace_lookup(
+            self.namespaces, canonical, self.namespace_aliases, self.default_namespaces
+        )
+        self._titles.clear()
         self.writeapi = "writeapi" in self.site
 
         self.version = self.version_tuple_from_generator(self.site["generator"])
@@ -199,8 +429,11 @@ class Site(object):
     async def close(self):
         """Closes the connection.
 
-        Should be called once you're done with the object to properly close the HTTP connection."""
-        await self.connection.close()
+        Should be called once you're done with the object to properly close the HTTP connection.
+        A session or connector passed to `init` is left open, since other Site objects
+        may still be using it."""
+        if self._owns_connection:
+            await self.connection.close()
 
     @staticmethod
     def version_tuple_from_generator(string, prefix="MediaWiki "):
@@ -246,6 +479,8 @@ class Site(object):
 
         return version_tuple
 
+    title_cache_size = 10000
+
     default_namespaces = {
         0: u"",
         1: u"Talk",
@@ -267,6 +502,96 @@ class Site(object):
         -2: u"Media",
     }
 
+    @staticmethod
+    def build_namespace_lookup(namespaces, *more_names):
+        """Build a table finding the id of a namespace from any of its names.
+
+        Args:
+            namespaces (dict): Namespace names by id. These take precedence.
+            *more_names (dict): More names by id, or ids by name, such as the
+                canonical names and the aliases.
+
+        Returns:
+            dict: Namespace ids by lower-case name, with spaces for underscores.
+        """
+        lookup = {}
+        for names in reversed((namespaces,) + more_names):
+            for key, value in names.items():
+                ns, name = (key, value) if isinstance(key, int) else (value, key)
+                if name:
+                    lookup[name.replace("_", " ").strip().lower()] = ns
+        return lookup
+
+    def resolve_namespace(self, title):
+        """Split a title into its namespace and the rest.
+
+        Local namespace names, canonical names and aliases are recognized, in any
+        case and with spaces or underscores.
+
+        Example:
+            >>> site.resolve_namespace('user_talk:Foo')
+            (3, 'Foo')
+
+        Args:
+            title (str): The title.
+
+        Returns:
+            tuple: The namespace id, or 0 if there is no known namespace prefix,
+            and the title without the prefix.
+        """
+        if title.startswith(":"):
+            title = title[1:]
+        colon = title.find(":")
+        if colon > 0:
+            ns = self._namespace_lookup.get(
+                title[:colon].replace("_", " ").strip().lower()
+            )
+            if ns:
+                return ns, title[colon + 1 :].lstrip(" _")
+        return 0, title
+
+    def normalize_title(self, title):
+        """Normalize a title the way the wiki does, without a request.
+
+        Underscores and runs of spaces become single spaces, a leading colon is
+        dropped, a namespace prefix is replaced by the local name of the namespace,
+        and the first letter of the title is uppercased unless the namespace is
+        case-sensitive. The results of the last `title_cache_size` titles are
+        remembered.
+
+        Example:
+            >>> site.normalize_title('image:foo_bar.jpg')
+            'File:Foo bar.jpg'
+
+        Args:
+            title (str): The title.
+
+        Returns:
+            str: The normalized title.
+        """
+        titles = self._titles
+        normalized = titles.get(title)
+        if normalized is not None:
+            titles.move_to_end(title)
+            return normalized
+
+        namespace, rest = self.resolve_namespace(
+            " ".join(title.replace("_", " ").split())
+        )
+        case = self.namespace_cases.get(namespace, "first-letter")
+        if rest and case != "case-sensitive":
+            rest = rest[0].upper() + rest[1:]
+        if namespace:
+            name = self.namespaces.get(namespace) or self.default_namespaces[namespace]
+            normalized = "%s:%s" % (name, rest)
+        else:
+            normalized = rest
+
+        titles[title] = normalized
+        while len(titles) > self.title_cache_size:
+            titles.popitem(last=False)
+        return normalized
+
     def __repr__(self):
         return "<Site object '%s%s'>" % (self.host, self.path)
 
@@ -314,10 +639,104 @@ class Site(object):
             The raw response from the API call, as a dictionary.
         """
         kwargs.update(args)
+        self._add_query_defaults(action, kwargs)
+
+        sleeper = self.sleepers.make()
+
+        while True:
+            info = await self.raw_api(action, http_method, **kwargs)
+            if not info:
+                info = {}
+            if await self.handle_api_result(info, sleeper=sleeper):
+                return info
+
+    async def query_pages(self, *args, **kwargs):
+        """Perform a query about a set of pages, following prop continuation.
+
+        All arguments will be passed on to `get`. Responses to continued queries
+        are merged into the page info received before, see `util.merge_page`.
+
+        Example:
+            >>> pages, query = await site.query_pages(
+            ...     prop='info|categories', titles='Foo|Bar'
+            ... )
+
+        Returns:
+            tuple: A list of page dicts, and the `query` member of the first
+            response, which holds the `normalized` and `redirects` mappings.
+        """
+        kwargs.update(args)
+        pages = {}
+        first = None
+        while True:
+            res = await self.get("query", **kwargs)
+            query = res.get("query", {})
+            if first is None:
+                first = query
+            for page in iter_pages(query.get("pages", {})):
+                # Missing pages have no id in the legacy format
+                key = page.get("pageid", page.get("title"))
+                if key in pages:
+                    merge_page(pages[key], page)
+                else:
+                    pages[key] = page
+            if not res.get("continue"):
+                return list(pages.values()), first
+            kwargs.update(res["continue"])
+
+    async def stream_api(self, action, path, rest=None, *args, **kwargs):
+        """Perform a generic API call using GET and yield the members of one array
+        or object of the response while the response is still being received.
+
+        Requires the ijson package. The rest of the response is checked for errors
+        like `api` does, once it has been read completely. The request holds its
+        throttle slot until the response has been consumed.
+
+        Example:
+            >>> async for page in site.stream_api(
+            ...     'query', ('query', 'allpages'), list='allpages', aplimit='max'
+            ... ):
+            ...     print(page['title'])
+
+        Args:
+            action (str): The API action.
+            path (tuple): The keys leading to the array or object in the response.
+            rest (dict): Filled with the rest of the response, without the array or
+                object at `path`.
+
+        Yields:
+            The members of the array, or the values of the object.
+        """
+        kwargs.update(args)
+        self._add_query_defaults(action, kwargs)
+        data = self._api_data(action, **kwargs)
+        if rest is None:
+            rest = {}
+
+        sleeper = self.sleepers.make()
 
+        while True:
+            rest.clear()
+            # Not `_request`: when this generator is closed, the response must be
+            # released even if the event loop has already closed the one below
+            responses = self._responses("api", data, http_method="GET")
+            items = None
+            try:
+                stream = await responses.__anext__()
+                items = iter_json_members(stream.content, path, rest)
+                async for item in items:
+                    yield item
+            finally:
+                if items is not None:
+                    await items.aclose()
+                await responses.aclose()
+            if await self.handle_api_result(rest, sleeper=sleeper):
+                return
+
+    def _add_query_defaults(self, action, kwargs):
         if action == "query" and "continue" not in kwargs:
             kwargs["continue"] = ""
-        if action == "query":
+        if action == "query" and self._wants_userinfo():
             if "meta" in kwargs:
                 kwargs["meta"] += "|userinfo"
             else:
@@ -327,14 +746,11 @@ class Site(object):
             else:
                 kwargs["uiprop"] = "blockinfo|hasmsg"
 
-        sleeper = self.sleepers.make()
-
-        while True:
-            info = await self.raw_api(action, http_method, **kwargs)
-            if not info:
-                info = {}
-            if await self.handle_api_result(info, sleeper=sleeper):
-                return info
+    def _wants_userinfo(self):
+        # With the minimal profile, the user status is only refreshed now and then
+        if self.field_profile != "minimal" or self._userinfo_time is None:
+            return True
+        return time.monotonic() - self._userinfo_time >= self.userinfo_interval
 
     async def handle_api_result(self, info, kwargs=None, sleeper=None):
         if sleeper is None:
@@ -342,18 +758,26 @@ class Site(object):
 
         try:
             userinfo = info["query"]["userinfo"]
-        except KeyError:
-            userinfo = ()
-        if "blockedby" in userinfo:
-            self.blocked = (userinfo["blockedby"], userinfo.get("blockreason", u""))
-        else:
-            self.blocked = False
-        self.hasmsg = "messages" in userinfo
-        self.logged_in = "anon" not in userinfo
+        except (KeyError, TypeError):
+            userinfo = None
+        if userinfo is not None:
+            # Responses without user info leave the known status alone
+            if "blockedby" in userinfo:
+                self.blocked = (
+                    userinfo["blockedby"],
+                    userinfo.get("blockreason", u""),
+                )
+            else:
+                self.blocked = False
+            # Flags are "" when set in the legacy format, and true or false with
+            # formatversion=2, which always includes `messages`
+            self.hasmsg = userinfo.get("messages", False) is not False
+            self.logged_in = userinfo.get("anon", False) is False
+            self._userinfo_time = time.monotonic()
         if "warnings" in info:
             for module, warning in info["warnings"].items():
-                if "*" in warning:
-                    log.warning(warning["*"])
+                if "*" in warning or "warnings" in warning:
+                    log.warning(content_value(warning, "warnings"))
 
         if "error" in info:
             if info["error"].get("code") in {
@@ -392,18 +816,30 @@ class Site(object):
     @staticmethod
     def _query_string(*args, **kwargs):
         kwargs.update(args)
-        qs1 = [
-            (k, v) for k, v in iter(kwargs.items()) if k not in {"wpEditToken", "token"}
-        ]
-        qs2 = [(k, v) for k, v in iter(kwargs.items()) if k in {"wpEditToken", "token"}]
-        return OrderedDict(qs1 + qs2)
+        # Tokens go last, so that a truncated POST body is rejected by the server
+        for key in ("wpEditToken", "token"):
+            if key in kwargs:
+                kwargs[key] = kwargs.pop(key)
+        return kwargs
 
     async def raw_call(
-        self, script, data, files=None, retry_on_error=True, http_method="POST"
+        self,
+        script,
+        data,
+        files=None,
+        retry_on_error=True,
+        http_method="POST",
+        raw=False,
     ):
         """
         Perform a generic request and return the raw text.
 
+        Every request waits for a slot in the site's read or write throttle
+        (see `max_concurrency` and `rate_limit` in `init`) before it is sent. A
+        replication lag response pauses all requests to the site, not just this one.
+        If `respect_retry_after` was set in `init`, so do HTTP 429 and 503 responses
+        with a Retry-After header, and both are retried.
+
         In the event of a network problem, or a HTTP response with status code 5XX,
         we'll wait and retry the configured number of times before giving up
         if `retry_on_error` is True.
@@ -418,14 +854,59 @@ class Site(object):
             files (dict): Files to upload
             retry_on_error (bool): Retry on connection error
             http_method (str): The HTTP method, defaults to 'POST'
+            raw (bool): Return the response body as bytes instead of decoding it
 
         Returns:
             The raw text response.
         """
-        headers = {}
+        sleeper = self.sleepers.make((script, data))
+        while True:
+            try:
+                async with self._request(
+                    script, data, files, retry_on_error, http_method, sleeper
+                ) as stream:
+                    if raw:
+                        return await stream.read()
+                    return await stream.text()
+            except (aiohttp.ClientPayloadError, aiohttp.ClientConnectionError):
+                # The connection broke while reading the response body
+                if not retry_on_error:
+                    raise
+                log.warning("Connection error. Retrying in a moment.")
+                await sleeper.sleep()
+
+    @asynccontextmanager
+    async def _request(self, *args, **kwargs):
+        """
+        Send a request as `_responses` does, and provide the response to an
+        `async with` block. The throttle slot stays taken until the block is exited.
+        """
+        responses = self._responses(*args, **kwargs)
+        try:
+            yield await responses.__anext__()
+        finally:
+            await responses.aclose()
+
+    async def _responses(
+        self,
+        script,
+        data,
+        files=None,
+        retry_on_error=True,
+        http_method="POST",
+        sleeper=None,
+    ):
+        """
+        Send a request, waiting and retrying as described in `raw_call`, and yield
+        the response once it has status 200. The response body is left unread and
+        the throttle slot stays taken until the generator is closed, which ends it
+        without retrying.
+        """
+        headers = dict(self._headers)
         if self.compress:
             headers["Accept-Encoding"] = "gzip"
-        sleeper = self.sleepers.make((script, data))
+        if sleeper is None:
+            sleeper = self.sleepers.make((script, data))
 
         scheme = self.scheme
         host = self.host
@@ -434,58 +915,111 @@ class Site(object):
             scheme=scheme, host=host, path=self.path, script=script, ext=self.ext
         )
 
+        # Requests carrying a token or files change the wiki, everything else reads
+        if files or "token" in data or "wpEditToken" in data:
+            throttle = self.write_throttle
+        else:
+            throttle = self.read_throttle
+        loop = asyncio.get_event_loop()
+
+        # Get rid of empty arguments
+        data = {k: v for (k, v) in data.items() if v is not None}
+
+        # Everything but file uploads is encoded once and reused for every retry
+        args = {"headers": headers}
+        if self._auth is not None:
+            args["auth"] = self._auth
+        for k, v in self.requests.items():
+            args[k] = v
+        if http_method == "GET":
+            args["params"] = data
+        elif not files:
+            args["data"] = urlencode(data).encode("utf-8")
+            headers["Content-Type"] = "application/x-www-form-urlencoded"
+
+        # Set once the response is handed to the caller, whose errors aren't retried
+        opened = False
+
         while True:
             try:
-                args = {"headers": headers}
-                form_data = aiohttp.FormData()
-                for k, v in self.requests.items():
-                    args[k] = v
-                # Get rid of empty arguments
-                data = {k: v for (k, v) in data.items() if v is not None}
-                if http_method == "GET":
-                    args["params"] = data
-                else:
-                    for n, v in data.items():
-                        form_data.add_field(n, v)
-                    args["data"] = form_data
                 if files:
+                    # Multipart form data can only be sent once, so build it anew
+                    form_data = aiohttp.FormData()
+                    if http_method != "GET":
+                        for n, v in data.items():
+                            form_data.add_field(n, v)
                     for n, v in files.items():
                         form_data.add_field(n, v)
                     args["data"] = form_data
 
-                async with self.connection.request(
-                    method=http_method, url=url, ssl=self.ssl, **args
-                ) as stream:
-                    if stream.headers.get("x-database-lag"):
-                        wait_time = int(stream.headers.get("retry-after"))
-                        log.warning(
-                            "Database lag exceeds max lag. "
-                            "Waiting for {} seconds".format(wait_time)
+                await self.gate.wait()
+                async with throttle:
+                    started = loop.time()
+                    async with self.connection.request(
+                        method=http_method, url=url, ssl=self.ssl, **args
+                    ) as stream:
+                        throttle.record(
+                            loop.time() - started,
+                            congested=bool(stream.headers.get("x-database-lag"))
+                            or stream.status == 429
+                            or stream.status >= 500,
                         )
-                        await sleeper.sleep(wait_time)
-                    elif stream.status == 200:
-                        return await stream.text()
-                    elif stream.status < 500 or stream.status_code > 599:
-                        stream.raise_for_status()
-                    else:
-                        if not retry_on_error:
+                        if stream.headers.get("x-database-lag"):
+                            wait_time = int(stream.headers.get("retry-after"))
+                            log.warning(
+                                "Database lag exceeds max lag. "
+                                "Waiting for {} seconds".format(wait_time)
+                            )
+                            # Hold back every other request to this site as well
+                            self.gate.pause(wait_time)
+                        elif stream.status == 200:
+                            if self.sleepers.budget is not None:
+                                self.sleepers.budget.deposit()
+                            opened = True
+                            yield stream
+                            return
+                        elif stream.status in {429, 503} and self.respect_retry_after:
+                            if not retry_on_error:
+                                stream.raise_for_status()
+                            wait_time = parse_retry_after(
+                                stream.headers.get("retry-after")
+                            )
+                            if wait_time is None:
+                                wait_time = 0
+                            else:
+                                # Cool down every other request to this site as well
+                                self.gate.pause(wait_time)
+                            log.warning(
+                                "Received {status} response. "
+                                "Waiting for at least {wait} seconds".format(
+                                    status=stream.status, wait=wait_time
+                                )
+                            )
+                        elif stream.status < 500 or stream.status > 599:
                             stream.raise_for_status()
-                        log.warning(
-                            "Received {status} response: {text}. "
-                            "Retrying in a moment.".format(
-                                status=stream.status, text=await stream.text()
+                        else:
+                            if not retry_on_error:
+                                stream.raise_for_status()
+                            log.warning(
+                                "Received {status} response: {text}. "
+                                "Retrying in a moment.".format(
+                                    status=stream.status, text=await stream.text()
+                                )
                             )
-                        )
-                        await sleeper.sleep()
+                            wait_time = 0
 
             except (aiohttp.ClientConnectionError, aiohttp.ServerTimeoutError):
                 # In the event of a network problem
                 # (e.g. DNS failure, refused connection, etc),
                 # Requests will raise a ConnectionError exception.
-                if not retry_on_error:
+                if opened or not retry_on_error:
                     raise
                 log.warning("Connection error. Retrying in a moment.")
-                await sleeper.sleep()
+                throttle.record(None, congested=True)
+                wait_time = 0
+
+            # Sleep outside the throttle, so waiting retries don't hold a slot
+            await sleeper.sleep(wait_time)
 
     async def raw_api(self, action, http_method="POST", *args, **kwargs):
         """Send a call to the API."""
@@ -493,19 +1027,37 @@ class Site(object):
             retry_on_error = kwargs.pop("retry_on_error")
         except KeyError:
             retry_on_error = True
-        kwargs["action"] = action
-        kwargs["format"] = "json"
-        data = self._query_string(*args, **kwargs)
+        data = self._api_data(action, *args, **kwargs)
         res = await self.raw_call(
-            "api", data, retry_on_error=retry_on_error, http_method=http_method
+            "api",
+            data,
+            retry_on_error=retry_on_error,
+            http_method=http_method,
+            raw=True,
         )
 
         try:
-            return json.loads(res, object_pairs_hook=OrderedDict)
+            if (
+                self.json_executor is not None
+                and len(res) >= self.json_offload_threshold
+            ):
+                # Keep large responses from blocking the event loop
+                return await asyncio.get_event_loop().run_in_executor(
+                    self.json_executor, self.json_loads, res
+                )
+            return self.json_loads(res)
         except ValueError:
-            if res.startswith("MediaWiki API is not enabled for this site."):
+            if res.startswith(b"MediaWiki API is not enabled for this site."):
                 raise errors.APIDisabledError
-            raise errors.InvalidResponse(res)
+            raise errors.InvalidResponse(res.decode("utf-8", "replace"))
+
+    def _api_data(self, action, *args, **kwargs):
+        kwargs["action"] = action
+        kwargs["format"] = "json"
+        if self.formatversion == 2:
+            kwargs.setdefault("formatversion", "2")
+        kwargs.setdefault("maxlag", self.max_lag)
+        return self._query_string(*args, **kwargs)
 
     async def raw_index(self, action, http_method="POST", *args, **kwargs):
         """Sends a call to index.php rather than the API."""
@@ -669,7 +1221,7 @@ class Site(object):
                     # Some dummy title was needed to get a token prior to 1.24
                     title = "Test"
                 info = await self.post("query", titles=title, prop="info", intoken=type)
-                for i in iter(info["query"]["pages"].values()):
+                for i in iter_pages(info["query"]["pages"]):
                     if i["title"] == title:
                         self.tokens[type] = i["%stoken" % type]
 
@@ -787,8 +1339,8 @@ class Site(object):
 
         sleeper = self.sleepers.make()
         while True:
-            data = await self.raw_call("api", postdata, files)
-            info = json.loads(data)
+            data = await self.raw_call("api", postdata, files, raw=True)
+            info = self.json_loads(data)
             if not info:
                 info = {}
             if await self.handle_api_result(info, kwargs=predata, sleeper=sleeper):
@@ -830,8 +1382,10 @@ class Site(object):
         offset = 0
         for chunk in read_in_chunks(file, self.chunk_size):
             while True:
-                data = await self.raw_call("api", params, files={"chunk": chunk})
-                info = json.loads(data)
+                data = await self.raw_call(
+                    "api", params, files={"chunk": chunk}, raw=True
+                )
+                info = self.json_loads(data)
                 if await self.handle_api_result(info, kwargs=params, sleeper=sleeper):
                     response = info.get("upload", {})
                     break
@@ -905,8 +1459,16 @@ class Site(object):
         filterlanglinks="all",
         generator=True,
         end=None,
+        props=None,
+        prop_args=None,
+        shards=None,
+        ordered=True,
     ):
-        """Retrieve all pages on the wiki as a generator."""
+        """Retrieve all pages on the wiki as a generator.
+
+        With `shards`, the scan is split into title ranges loaded concurrently,
+        see `_sharded_list`.
+        """
 
         pfx = listing.List.get_prefix("ap", generator)
         kwargs = dict(
@@ -925,8 +1487,15 @@ class Site(object):
                 filterlanglinks=filterlanglinks,
             )
         )
-        return listing.List.get_list(generator)(
-            self, "allpages", "ap", limit=limit, return_values="title", **kwargs
+        kwargs.update(listing.List.get_prop_kwargs(generator, props, prop_args))
+        return self._sharded_list(
+            generator,
+            "allpages",
+            "ap",
+            dict(limit=limit, return_values="title", **kwargs),
+            shards,
+            namespace,
+            ordered,
         )
 
     def allimages(
@@ -941,8 +1510,18 @@ class Site(object):
         sha1base36=None,
         generator=True,
         end=None,
+        props=None,
+        prop_args=None,
+        field_profile=None,
+        shards=None,
+        ordered=True,
     ):
-        """Retrieve all images on the wiki as a generator."""
+        """Retrieve all images on the wiki as a generator.
+
+        The `field_profile` overrides the field profile of the site, see `Site`.
+        With `shards`, the scan is split into title ranges loaded concurrently,
+        see `_sharded_list`.
+        """
 
         pfx = listing.List.get_prefix("ai", generator)
         kwargs = dict(
@@ -958,13 +1537,20 @@ class Site(object):
                 sha1base36=sha1base36,
             )
         )
-        return listing.List.get_list(generator)(
-            self,
+        kwargs.update(listing.List.get_prop_kwargs(generator, props, prop_args))
+        return self._sharded_list(
+            generator,
             "allimages",
             "ai",
-            limit=limit,
-            return_values="timestamp|url",
-            **kwargs
+            dict(
+                limit=limit,
+                return_values="timestamp|url",
+                field_profile=field_profile,
+                **kwargs
+            ),
+            shards,
+            6,
+            ordered,
         )
 
     def alllinks(
@@ -977,8 +1563,16 @@ class Site(object):
         limit=None,
         generator=True,
         end=None,
+        props=None,
+        prop_args=None,
+        shards=None,
+        ordered=True,
     ):
-        """Retrieve a list of all links on the wiki as a generator."""
+        """Retrieve a list of all links on the wiki as a generator.
+
+        With `shards`, the scan is split into title ranges loaded concurrently,
+        see `_sharded_list`.
+        """
 
         pfx = listing.List.get_prefix("al", generator)
         kwargs = dict(
@@ -993,8 +1587,15 @@ class Site(object):
         )
         if unique:
             kwargs[pfx + "unique"] = "1"
-        return listing.List.get_list(generator)(
-            self, "alllinks", "al", limit=limit, return_values="title", **kwargs
+        kwargs.update(listing.List.get_prop_kwargs(generator, props, prop_args))
+        return self._sharded_list(
+            generator,
+            "alllinks",
+            "al",
+            dict(limit=limit, return_values="title", **kwargs),
+            shards,
+            namespace,
+            ordered,
         )
 
     def allcategories(
@@ -1005,8 +1606,16 @@ class Site(object):
         limit=None,
         generator=True,
         end=None,
+        props=None,
+        prop_args=None,
+        shards=None,
+        ordered=True,
     ):
-        """Retrieve all categories on the wiki as a generator."""
+        """Retrieve all categories on the wiki as a generator.
+
+        With `shards`, the scan is split into title ranges loaded concurrently,
+        see `_sharded_list`.
+        """
 
         pfx = listing.List.get_prefix("ac", generator)
         kwargs = dict(
@@ -1014,8 +1623,46 @@ class Site(object):
                 pfx, ("from", start), ("to", end), prefix=prefix, dir=dir
             )
         )
-        return listing.List.get_list(generator)(
-            self, "allcategories", "ac", limit=limit, **kwargs
+        kwargs.update(listing.List.get_prop_kwargs(generator, props, prop_args))
+        return self._sharded_list(
+            generator,
+            "allcategories",
+            "ac",
+            dict(limit=limit, **kwargs),
+            shards,
+            14,
+            ordered,
+        )
+
+    def _sharded_list(
+        self, generator, list_name, prefix, list_args, shards, namespace, ordered
+    ):
+        """Create an alphabetical listing, split into shards if `shards` is set.
+
+        `shards` is either the number of title ranges, whose boundaries are then
+        sampled from random titles of the namespace, or a list of the titles at
+        which to split the listing. Each range follows its own continuation chain,
+        concurrently with the others. With `ordered`, the ranges are yielded one
+        after the other, with the ranges being loaded ahead buffering a few chunks
+        until their turn. Items of lists then come in the usual order, but the
+        pages of generators are only ordered by chunk, as in the responses.
+        Otherwise the items are yielded as they are loaded.
+
+        Returns:
+            Union[listing.List, listing.ShardedList]: The listing.
+        """
+        list_class = listing.List.get_list(generator)
+        if not shards:
+            return list_class(self, list_name, prefix, **list_args)
+        return listing.ShardedList(
+            list_class,
+            self,
+            list_name,
+            prefix,
+            list_args,
+            shards,
+            namespace=namespace,
+            ordered=ordered,
         )
 
     def allusers(
@@ -1142,8 +1789,14 @@ class Site(object):
         title=None,
         limit=None,
         action=None,
+        window=None,
+        concurrency=4,
     ):
-        """Retrieve logevents as a generator."""
+        """Retrieve logevents as a generator.
+
+        With `window`, the range from `start` to `end` is split into windows of
+        that many seconds, loaded concurrently, see `_windowed_list`.
+        """
         kwargs = dict(
             listing.List.generate_kwargs(
                 "le",
@@ -1157,7 +1810,9 @@ class Site(object):
                 action=action,
             )
         )
-        return listing.List(self, "logevents", "le", limit=limit, **kwargs)
+        return self._windowed_list(
+            "logevents", "le", dict(limit=limit, **kwargs), window, concurrency
+        )
 
     def checkuserlog(
         self, user=None, target=None, limit=10, dir="older", start=None, end=None
@@ -1198,8 +1853,14 @@ class Site(object):
         limit=None,
         type=None,
         toponly=None,
+        window=None,
+        concurrency=4,
     ):
-        """List recent changes to the wiki, à la Special:Recentchanges."""
+        """List recent changes to the wiki, à la Special:Recentchanges.
+
+        With `window`, the range from `start` to `end` is split into windows of
+        that many seconds, loaded concurrently, see `_windowed_list`.
+        """
         kwargs = dict(
             listing.List.generate_kwargs(
                 "rc",
@@ -1213,44 +1874,127 @@ class Site(object):
                 toponly="1" if toponly else None,
             )
         )
-        return listing.List(self, "recentchanges", "rc", limit=limit, **kwargs)
+        return self._windowed_list(
+            "recentchanges", "rc", dict(limit=limit, **kwargs), window, concurrency
+        )
+
+    def _windowed_list(self, list_name, prefix, list_args, window, concurrency):
+        """Create a listing in timestamp order, split into time windows if
+        `window` is set.
+
+        The windows are disjoint and `concurrency` of them are loaded at the same
+        time. The items are yielded in timestamp order, with the windows being
+        loaded ahead buffering a few chunks until their turn, so `concurrency` also
+        bounds the memory used. Both `start` and `end` must be given.
+
+        Returns:
+            Union[listing.List, listing.TimeShardedList]: The listing.
+        """
+        if not window:
+            return listing.List(self, list_name, prefix, **list_args)
+        return listing.TimeShardedList(
+            listing.List,
+            self,
+            list_name,
+            prefix,
+            list_args,
+            window,
+            concurrency=concurrency,
+        )
 
     async def revisions(self, revids, prop="ids|timestamp|flags|comment|user"):
         """Get data about a list of revisions.
 
-        See also the `Page.revisions()` method.
+        See also the `Page.revisions()` method, and `iterrevisions` to handle the
+        revisions while they are being loaded.
 
         API doc: https://www.mediawiki.org/wiki/API:Revisions
 
         Example: Get revision text for two revisions:
 
             >>> for revision in site.revisions([689697696, 689816909], prop='content'):
-            ...     print revision['*']
+            ...     print revision['*']  # revision['content'] with formatversion=2
 
         Args:
-            revids (list): A list of (max 50) revisions.
+            revids (list): A list of revisions, of any length.
             prop (str): Which properties to get for each revision.
 
         Returns:
-            A list of revisions
+            A list of revisions, in the order of `revids`
         """
-        kwargs = {
-            "prop": "revisions",
-            "rvprop": prop,
-            "revids": "|".join(map(str, revids)),
-        }
+        return [revision async for revision in self.iterrevisions(revids, prop)]
+
+    async def iterrevisions(
+        self, revids, prop="ids|timestamp|flags|comment|user", concurrency=4
+    ):
+        """Get data about a list of revisions, yielding them in the order of
+        `revids` as they are loaded.
+
+        The revisions are requested in batches of 50, or 500 if the user has the
+        `apihighlimits` right and no content is requested. Up to `concurrency`
+        batches are loaded at the same time, subject to the limits of the site.
+        Revisions that don't exist are skipped.
 
-        revisions = []
-        res = await self.get("query", **kwargs)
-        pages = res.get("query", {}).get("pages", {}).values()
+        Example:
+            >>> async for revision in site.iterrevisions(revids, prop='ids|size'):
+            ...     print(revision['revid'], revision['size'])
+
+        Args:
+            revids (Iterable[int]): The revision ids.
+            prop (str): Which properties to get for each revision.
+            concurrency (int): The number of batches loaded ahead of the one whose
+                revisions are being yielded.
+        """
+        if "content" in prop or "apihighlimits" not in self.rights:
+            size = 50
+        else:
+            size = 500
+        if "ids" not in prop.split("|"):
+            # Needed to put the revisions in order
+            prop += "|ids"
+        revids = list(revids)
+        batches = (revids[i : i + size] for i in range(0, len(revids), size))
+
+        pending = collections.deque()
+        try:
+            for batch in batches:
+                pending.append(
+                    (batch, asyncio.ensure_future(self._load_revisions(batch, prop)))
+                )
+                if len(pending) < concurrency:
+                    continue
+                batch, task = pending.popleft()
+                for revision in self._ordered_revisions(batch, await task):
+                    yield revision
+            while pending:
+                batch, task = pending.popleft()
+                for revision in self._ordered_revisions(batch, await task):
+                    yield revision
+        finally:
+            for batch, task in pending:
+                task.cancel()
+
+    async def _load_revisions(self, revids, prop):
+        pages, query = await self.query_pages(
+            prop="revisions", rvprop=prop, revids="|".join(map(str, revids))
+        )
+        revisions = {}
         for page in pages:
             for revision in page.get("revisions", ()):
                 revision["pageid"] = page.get("pageid")
                 revision["pagetitle"] = page.get("title")
-                revision["timestamp"] = parse_timestamp(revision["timestamp"])
-                revisions.append(revision)
+                if "timestamp" in revision:
+                    revision["timestamp"] = parse_timestamp(revision["timestamp"])
+                revisions[revision.get("revid")] = revision
         return revisions
 
+    @staticmethod
+    def _ordered_revisions(revids, revisions):
+        for revid in revids:
+            revision = revisions.get(int(revid))
+            if revision is not None:
+                yield revision
+
     def search(self, search, namespace="0", what=None, redirects=False, limit=None):
         """Perform a full text search.
 
@@ -1296,10 +2040,15 @@ class Site(object):
         show=None,
         limit=None,
         uselang=None,
+        window=None,
+        concurrency=4,
     ):
         """
         List the contributions made by a given user to the wiki.
 
+        With `window`, the range from `start` to `end` is split into windows of
+        that many seconds, loaded concurrently, see `_windowed_list`.
+
         API doc: https://www.mediawiki.org/wiki/API:Usercontribs
         """
         kwargs = dict(
@@ -1314,8 +2063,12 @@ class Site(object):
                 show=show,
             )
         )
-        return listing.List(
-            self, "usercontribs", "uc", limit=limit, uselang=uselang, **kwargs
+        return self._windowed_list(
+            "usercontribs",
+            "uc",
+            dict(limit=limit, uselang=uselang, **kwargs),
+            window,
+            concurrency,
         )
 
     def users(self, users, prop="blockinfo|groups|editcount"):
@@ -1374,10 +2127,11 @@ class Site(object):
 
         result = await self.get("expandtemplates", text=text, **kwargs)
 
+        wikitext = content_value(result["expandtemplates"], "wikitext")
         if generatexml:
-            return result["expandtemplates"]["*"], result["parsetree"]["*"]
+            return wikitext, content_value(result["parsetree"], "xml")
         else:
-            return result["expandtemplates"]["*"]
+            return wikitext
 
     async def ask(self, query, title=None):
         """
@@ -1,26 +1,60 @@
 import aiomwclient.listing
 import aiomwclient.page
+from aiomwclient.util import iter_pages
+
+# The file properties requested for each field profile of the site, see `Site`
+IMAGEINFO_PROPS = {
+    "minimal": None,
+    "default": "timestamp|user|comment|url|size|sha1|metadata|archivename",
+    "full": "timestamp|user|comment|url|size|sha1|mime|mediatype|metadata"
+    "|extmetadata|archivename",
+}
 
 
 class Image(aiomwclient.page.Page):
     async def init(self, site, name, info=None) -> "Image":
+        iiprop = IMAGEINFO_PROPS[site.field_profile]
         await super(Image, self).init(
             site,
             name,
             info,
-            extra_properties={
-                "imageinfo": (
-                    (
-                        "iiprop",
-                        "timestamp|user|comment|url|size|sha1|metadata|archivename",
-                    ),
-                )
-            },
+            extra_properties={"imageinfo": (("iiprop", iiprop),)} if iiprop else None,
         )
-        self.imagerepository = self._info.get("imagerepository", "")
-        self.imageinfo = self._info.get("imageinfo", ({},))[0]
         return self
 
+    def _set_info(self, info):
+        super(Image, self)._set_info(info)
+        self.imagerepository = self._info.get("imagerepository", "")
+        if "imageinfo" in self._info:
+            self.imageinfo = (
+                self._info["imageinfo"][0] if self._info["imageinfo"] else {}
+            )
+        else:
+            # Loaded on first use, see `load_imageinfo`
+            self.imageinfo = None
+
+    async def load_imageinfo(self, profile="default"):
+        """
+        Load the file info, if it was left out by the "minimal" field profile.
+
+        Args:
+            profile (str): The field profile of the properties to load.
+
+        Returns:
+            dict: The file info.
+        """
+        if self.imageinfo is None:
+            info = await self.site.get(
+                "query",
+                prop="imageinfo",
+                titles=self.name,
+                iiprop=IMAGEINFO_PROPS[profile],
+            )
+            page = next(iter(iter_pages(info["query"]["pages"])))
+            self.imagerepository = page.get("imagerepository", "")
+            self.imageinfo = page.get("imageinfo", ({},))[0]
+        return self.imageinfo
+
     def imagehistory(self):
         """
         Get file revision info for the given file.
@@ -31,7 +65,8 @@ class Image(aiomwclient.page.Page):
             self,
             "imageinfo",
             "ii",
-            iiprop="timestamp|user|comment|url|size|sha1|metadata|archivename",
+            iiprop=IMAGEINFO_PROPS[self.site.field_profile]
+            or IMAGEINFO_PROPS["default"],
         )
 
     def imageusage(
@@ -41,6 +76,8 @@ class Image(aiomwclient.page.Page):
         redirect=False,
         limit=None,
         generator=True,
+        props=None,
+        prop_args=None,
     ):
         """
         List pages that use the given file.
@@ -55,6 +92,9 @@ class Image(aiomwclient.page.Page):
         )
         if redirect:
             kwargs["%sredirect" % prefix] = "1"
+        kwargs.update(
+            aiomwclient.listing.List.get_prop_kwargs(generator, props, prop_args)
+        )
         return aiomwclient.listing.List.get_list(generator)(
             self.site, "imageusage", "iu", limit=limit, return_values="title", **kwargs
         )
@@ -83,7 +123,7 @@ class Image(aiomwclient.page.Page):
         Args:
             destination (file object): Destination file
         """
-        url = self.imageinfo["url"]
+        url = (await self.load_imageinfo())["url"]
         if destination is not None:
             res = await self.site.connection.get(url, stream=True)
             for chunk in res.iter_content(1024):
@@ -1,6 +1,38 @@
+import asyncio
+import calendar
+import datetime
+import heapq
+import operator
+import time
+
 import aiomwclient.image
 import aiomwclient.page
-from aiomwclient.util import parse_timestamp
+from aiomwclient.util import iter_pages, merge_page, parse_timestamp
+
+# How much is fetched along with each request, see `Site`
+FIELD_PROFILES = ("minimal", "default", "full")
+
+# What the timestamps of list items are converted to, see `List`
+TIMESTAMP_FORMATS = ("struct_time", "datetime", "epoch", "lazy", "raw")
+
+
+class LazyTimestampItem(dict):
+    """A list item whose timestamp is converted to a struct_time when it is first
+    read with `item['timestamp']` or `item.get('timestamp')`."""
+
+    __slots__ = ()
+
+    def __getitem__(self, key):
+        value = dict.__getitem__(self, key)
+        if key == "timestamp" and isinstance(value, str):
+            value = parse_timestamp(value)
+            self[key] = value
+        return value
+
+    def get(self, key, default=None):
+        if key in self:
+            return self[key]
+        return default
 
 
 class List(object):
@@ -9,6 +41,27 @@ class List(object):
     This is a class providing lazy iteration.  This means that the
     content is loaded in chunks as long as the response hints at
     continuing content.
+
+    With `stream`, items are parsed from each response as it arrives instead of
+    after the whole chunk has been loaded, which requires the ijson package. It
+    defaults to the `stream_lists` setting of the site. A response being streamed
+    is released once `max_items` is reached, or by `aclose` when leaving the
+    iteration early.
+
+    The `field_profile` overrides the field profile of the site for this list.
+
+    With a `prefetch` depth of N, the following chunks are loaded by a background
+    task while the items of the current chunk are being processed, up to N chunks
+    ahead. The task stops once `max_items` is reached. Call `aclose` to stop it
+    when leaving the iteration early. Prefetching lists are not streamed.
+
+    Besides item by item, a list can be iterated chunk by chunk with `batches`.
+
+    The `timestamps` of items are converted to "struct_time" by default, or to
+    "datetime" or "epoch", see `util.parse_timestamp`. With "lazy", items are
+    `LazyTimestampItem` dicts that convert their timestamp to struct_time when
+    it is read, and with "raw" it is left as a string. The default is the
+    `timestamps` setting of the site.
     """
 
     def __init__(
@@ -20,6 +73,10 @@ class List(object):
         return_values=None,
         max_items=None,
         *args,
+        stream=None,
+        field_profile=None,
+        prefetch=0,
+        timestamps=None,
         **kwargs
     ):
         # NOTE: Fix limit
@@ -39,10 +96,27 @@ class List(object):
         self.max_items = max_items
 
         self._iter = iter(range(0))
+        self._stream_iter = None
+        self._chunk = iter(range(0))
+        self._chunks = None
+        self._chunk_slots = None
+        self._prefetcher = None
 
         self.last = False
         self.result_member = list_name
         self.return_values = return_values
+        self.stream = site.stream_lists if stream is None else stream
+        if field_profile is None:
+            field_profile = site.field_profile
+        elif field_profile not in FIELD_PROFILES:
+            raise ValueError("Unknown field profile: %s" % field_profile)
+        self.field_profile = field_profile
+        self.prefetch = prefetch
+        if timestamps is None:
+            timestamps = site.timestamps
+        elif timestamps not in TIMESTAMP_FORMATS:
+            raise ValueError("Unknown timestamp format: %s" % timestamps)
+        self.timestamps = timestamps
 
     def __aiter__(self):
         return self
@@ -50,6 +124,8 @@ class List(object):
     async def __anext__(self):
         if self.max_items is not None:
             if self.count >= self.max_items:
+                self._stop_prefetch()
+                await self._close_stream()
                 raise StopAsyncIteration
 
         # For filered lists, we might have to do several requests
@@ -57,17 +133,26 @@ class List(object):
         # See: https://github.com/mwclient/mwclient/issues/194
         while True:
             try:
-                item = next(self._iter)
+                if self._stream_iter is not None:
+                    item = await self._stream_iter.__anext__()
+                elif self.prefetch:
+                    item = next(self._chunk)
+                else:
+                    item = next(self._iter)
                 if item is not None:
                     break
-            except StopIteration:
+            except (StopIteration, StopAsyncIteration):
+                self._stream_iter = None
+                if self.prefetch:
+                    self._chunk = await self._next_prefetched_chunk()
+                    continue
                 if self.last:
                     raise StopAsyncIteration
                 await self.load_chunk()
 
         self.count += 1
         if "timestamp" in item:
-            item["timestamp"] = parse_timestamp(item["timestamp"])
+            item = self.convert_timestamp(item)
 
         if isinstance(self, GeneratorList):
             return item
@@ -77,6 +162,77 @@ class List(object):
             return item[self.return_values]
         return item
 
+    async def batches(self):
+        """Iterate over the list one chunk at a time.
+
+        Each chunk is yielded as a list of the same values iterating the list
+        item by item would give, processed in bulk. Items left in the current
+        chunk by previous item by item iteration come first.
+
+        Example:
+            >>> async for titles in site.allpages(generator=False).batches():
+            ...     print(len(titles))
+        """
+        while True:
+            if self.max_items is not None and self.count >= self.max_items:
+                self._stop_prefetch()
+                await self._close_stream()
+                return
+            items = await self._next_items()
+            if items is None:
+                return
+            items = [item for item in items if item is not None]
+            if self.max_items is not None:
+                items = items[: self.max_items - self.count]
+            if items:
+                self.count += len(items)
+                yield await self.convert_batch(items)
+
+    async def _next_items(self):
+        # The rest of the current chunk, or the next one if there is no rest.
+        # None once the list is exhausted.
+        while True:
+            if self._stream_iter is not None:
+                items = [item async for item in self._stream_iter]
+                self._stream_iter = None
+            elif self.prefetch:
+                items = list(self._chunk)
+            else:
+                items = list(self._iter)
+            if items:
+                return items
+            if self.prefetch:
+                try:
+                    self._chunk = await self._next_prefetched_chunk()
+                except StopAsyncIteration:
+                    return None
+            elif self.last:
+                return None
+            else:
+                await self.load_chunk()
+
+    async def convert_batch(self, items):
+        """Turn a chunk of raw response items into the values yielded by
+        `batches`."""
+        items = [
+            self.convert_timestamp(item) if "timestamp" in item else item
+            for item in items
+        ]
+        if type(self.return_values) is tuple:
+            return [tuple((item[i] for i in self.return_values)) for item in items]
+        if self.return_values is not None:
+            return [item[self.return_values] for item in items]
+        return items
+
+    def convert_timestamp(self, item):
+        """Convert the timestamp of an item as set by `timestamps`."""
+        if self.timestamps == "raw":
+            return item
+        if self.timestamps == "lazy":
+            return LazyTimestampItem(item)
+        item["timestamp"] = parse_timestamp(item["timestamp"], self.timestamps)
+        return item
+
     async def load_chunk(self):
         """Query a new chunk of data
 
@@ -92,7 +248,13 @@ class List(object):
         style continuation).
 
         Else, set `self.last` to True.
+
+        When streaming, the request is only sent once the items are iterated.
         """
+        if self.stream and not self.prefetch:
+            self._stream_iter = self.stream_chunk()
+            return
+
         data = await self.site.get(
             "query",
             (self.generator, self.list_name),
@@ -107,6 +269,92 @@ class List(object):
         if "query" in data:
             self.set_iter(data)
 
+        self.update_continue(data)
+
+    async def _next_prefetched_chunk(self):
+        """Take the next chunk loaded by the prefetching task, starting the task
+        on the first call.
+
+        Returns:
+            An iterator over the items of the chunk.
+
+        Raises:
+            StopAsyncIteration: There are no more chunks.
+        """
+        if self._chunks is None:
+            self._chunks = asyncio.Queue()
+            self._chunk_slots = asyncio.Semaphore(self.prefetch)
+            self._prefetcher = asyncio.ensure_future(self._prefetch_chunks())
+
+        chunk, error = await self._chunks.get()
+        if chunk is None:
+            # Leave the end marker for the next call
+            self._chunks.put_nowait((None, None))
+            if error is not None:
+                raise error
+            raise StopAsyncIteration
+        self._chunk_slots.release()
+        return chunk
+
+    async def _prefetch_chunks(self):
+        # The only writer of `self._iter` and the continuation while prefetching
+        try:
+            while not self.last:
+                await self._chunk_slots.acquire()
+                await self.load_chunk()
+                self._chunks.put_nowait((self._iter, None))
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            self._chunks.put_nowait((None, e))
+            return
+        self._chunks.put_nowait((None, None))
+
+    def _stop_prefetch(self):
+        if self._prefetcher is not None and not self._prefetcher.done():
+            self._prefetcher.cancel()
+
+    async def _close_stream(self):
+        # Release the response of a partly read chunk, and its throttle slot
+        if self._stream_iter is not None:
+            stream_iter, self._stream_iter = self._stream_iter, None
+            await stream_iter.aclose()
+
+    async def aclose(self):
+        """Stop loading chunks in the background, if prefetching, and release the
+        response being streamed, if any."""
+        self._stop_prefetch()
+        await self._close_stream()
+
+    async def stream_chunk(self):
+        """Query a new chunk of data and yield its items as they are received.
+
+        Continuation is handled as in `load_chunk` once the response has been
+        read completely.
+        """
+        rest = {}
+        items = self.site.stream_api(
+            "query",
+            self.stream_path(),
+            rest,
+            (self.generator, self.list_name),
+            *[(str(k), v) for k, v in iter(self.args.items())]
+        )
+        try:
+            async for item in items:
+                yield item
+        finally:
+            # Closed right away when the list stops early, instead of whenever the
+            # generator is collected, so the response is released
+            await items.aclose()
+        self.update_continue(rest)
+
+    def stream_path(self):
+        """The keys leading to the items in the API response."""
+        return ("query", self.result_member)
+
+    def update_continue(self, data):
+        """Update `self.args` with the continuation in the API response `data`."""
         if data.get("continue"):
             # New style continuation, added in MediaWiki 1.21
             self.args.update(data["continue"])
@@ -145,6 +393,16 @@ class List(object):
     def get_list(generator=False):
         return GeneratorList if generator else List
 
+    @staticmethod
+    def get_prop_kwargs(generator=False, props=None, prop_args=None):
+        """The arguments requesting `props` from a `GeneratorList`.
+
+        Plain lists don't yield pages, so they get no arguments.
+        """
+        if not generator:
+            return {}
+        return {"props": props, "prop_args": prop_args}
+
 
 class NestedList(List):
     def __init__(self, nested_param, *args, **kwargs):
@@ -154,6 +412,9 @@ class NestedList(List):
     def set_iter(self, data):
         self._iter = iter(data["query"][self.result_member][self.nested_param])
 
+    def stream_path(self):
+        return ("query", self.result_member, self.nested_param)
+
 
 class GeneratorList(List):
     """Lazy-loaded list of Page, Image or Category objects
@@ -161,17 +422,48 @@ class GeneratorList(List):
     While the standard List class yields raw response data
     (optionally filtered based on the value of List.return_values),
     this subclass turns the data into Page, Image or Category objects.
+
+    Additional properties of the pages can be requested with `props`, such
+    as `('revisions', 'categories')`, along with their parameters in
+    `prop_args`, such as `{'rvprop': 'content', 'cllimit': 'max'}`. The
+    responses to continued property queries are merged, and the values are
+    attached to the yielded objects as `page.props`. If the current content
+    is requested, it also fills the text cache of the page.
+
+    With `lazy_pages`, `LazyPage` objects are yielded instead, which take
+    less memory and turn into full page objects when needed. The default is
+    the `lazy_pages` setting of the site.
     """
 
-    def __init__(self, site, list_name, prefix, *args, **kwargs):
+    def __init__(
+        self,
+        site,
+        list_name,
+        prefix,
+        *args,
+        props=None,
+        prop_args=None,
+        lazy_pages=None,
+        **kwargs
+    ):
         super(GeneratorList, self).__init__(site, list_name, prefix, *args, **kwargs)
+        self.lazy_pages = site.lazy_pages if lazy_pages is None else lazy_pages
 
         self.args["g" + self.prefix + "limit"] = self.args[self.prefix + "limit"]
         del self.args[self.prefix + "limit"]
         self.generator = "generator"
 
-        self.args["prop"] = "info|imageinfo"
+        self.props = tuple(props or ())
+        if aiomwclient.image.IMAGEINFO_PROPS[self.field_profile]:
+            self.args["prop"] = "|".join(("info", "imageinfo") + self.props)
+        else:
+            self.args["prop"] = "|".join(("info",) + self.props)
         self.args["inprop"] = "protection"
+        if prop_args:
+            self.args.update(prop_args)
+        if self.props:
+            # Pages may be completed by continued queries
+            self.stream = False
 
         self.result_member = "pages"
 
@@ -179,19 +471,68 @@ class GeneratorList(List):
 
     async def __anext__(self):
         info = await super(GeneratorList, self).__anext__()
-        if info["ns"] == 14:
-            return await Category().init(self.site, u"", info)
-        if info["ns"] == 6:
-            return await aiomwclient.image.Image().init(self.site, u"", info)
-        return await aiomwclient.page.Page().init(self.site, u"", info)
+        return self._make_page(info)
+
+    async def convert_batch(self, items):
+        items = [
+            self.convert_timestamp(info) if "timestamp" in info else info
+            for info in items
+        ]
+        return [self._make_page(info) for info in items]
+
+    def _make_page(self, info):
+        if self.lazy_pages:
+            page = aiomwclient.page.LazyPage(self.site, info)
+        else:
+            page = PageList.page_from_info(self.site, info)
+        if self.props or not self.lazy_pages:
+            page.props = {prop: info[prop] for prop in self.props if prop in info}
+            # A lazy page caches the revision content when it is materialized
+            if "revisions" in page.props and not self.lazy_pages:
+                page._cache_revision(page.props["revisions"])
+        return page
 
     async def load_chunk(self):
         # Put this here so that the constructor does not fail
         # on uninitialized sites
-        self.args[
-            "iiprop"
-        ] = "timestamp|user|comment|url|size|sha1|metadata|archivename"
-        return await super(GeneratorList, self).load_chunk()
+        iiprop = aiomwclient.image.IMAGEINFO_PROPS[self.field_profile]
+        if iiprop:
+            self.args["iiprop"] = iiprop
+        if self.stream and not self.prefetch:
+            return await super(GeneratorList, self).load_chunk()
+
+        # The properties of the pages of one generator chunk may be spread over
+        # several responses, until the batch is complete
+        args = dict(self.args)
+        pages = {}
+        while True:
+            data = await self.site.get(
+                "query",
+                (self.generator, self.list_name),
+                *[(str(k), v) for k, v in iter(args.items())]
+            )
+            for page in iter_pages(data.get("query", {}).get("pages", {})):
+                key = page.get("pageid", page.get("title"))
+                if key in pages:
+                    merge_page(pages[key], page)
+                else:
+                    pages[key] = page
+            if "batchcomplete" in data or not self._continues_props(data):
+                break
+            args = dict(self.args, **data["continue"])
+
+        self._iter = iter(pages.values())
+        self.update_continue(data)
+
+    def _continues_props(self, data):
+        # Whether the response continues the properties of the pages of its chunk.
+        # MediaWiki before 1.25 doesn't send `batchcomplete`, so look for
+        # continuation parameters other than those of the generator.
+        generator_prefix = "g" + self.prefix
+        return any(
+            key != "continue" and not key.startswith(generator_prefix)
+            for key in data.get("continue", ())
+        )
 
 
 class Category(aiomwclient.page.Page, GeneratorList):
@@ -208,6 +549,14 @@ class Category(aiomwclient.page.Page, GeneratorList):
         GeneratorList.__init__(self, site, "categorymembers", "cm", **kwargs)
         return self
 
+    @classmethod
+    def from_info(cls, site, info):
+        category = super(Category, cls).from_info(site, info)
+        GeneratorList.__init__(
+            category, site, "categorymembers", "cm", gcmtitle=category.name
+        )
+        return category
+
     def __repr__(self):
         return "<Category object '%s' for %s>" % (self.name.encode("utf-8"), self.site)
 
@@ -220,6 +569,8 @@ class Category(aiomwclient.page.Page, GeneratorList):
         start=None,
         end=None,
         generator=True,
+        props=None,
+        prop_args=None,
     ):
         prefix = self.get_prefix("cm", generator)
         kwargs = dict(
@@ -234,6 +585,7 @@ class Category(aiomwclient.page.Page, GeneratorList):
                 title=self.name,
             )
         )
+        kwargs.update(self.get_prop_kwargs(generator, props, prop_args))
         return self.get_list(generator)(self.site, "categorymembers", "cm", **kwargs)
 
 
@@ -273,32 +625,129 @@ class PageList(GeneratorList):
         Returns:
             One of Category, Image or Page (default), according to namespace.
         """
+        full_page_name = self._full_name(name)
         if self.namespace != 0:
-            full_page_name = u"{namespace}:{name}".format(
-                namespace=self.site.namespaces[self.namespace],
-                name=name,
-            )
             namespace = self.namespace
         else:
-            full_page_name = name
             try:
                 namespace = self.guess_namespace(name)
             except AttributeError:
                 # raised when `namespace` doesn't have a `startswith` attribute
                 namespace = 0
 
+        return await self.make_page(self.site, namespace, full_page_name, info)
+
+    async def get_many(self, names, with_text=True, concurrency=4):
+        """Load many pages at once, yielding them as they are loaded.
+
+        The pages are requested in batches of 50 titles (500 without text if the
+        user has the `apihighlimits` right), of which up to `concurrency` are
+        loaded at the same time, subject to the limits of the site. Each
+        batch is a single `prop=info|revisions` query that also returns the
+        current wikitext of the pages, which is put in the text cache of each page
+        so that `Page.text()` doesn't need another request.
+
+        Example:
+            >>> async for page in site.pages.get_many(['Foo', 'Bar']):
+            ...     print(page.name, len(await page.text()))
+
+        Args:
+            names (Iterable[str]): The page names, treated as in `get`.
+            with_text (bool): Also load the current wikitext of the pages.
+            concurrency (int): The number of batches loaded at the same time.
+
+        Returns:
+            One of Category, Image or Page for each page, in the order their
+            batches complete. Names that refer to the same page yield it once.
+        """
+        # Normalized titles let different spellings of a page share a lookup
+        names = list(
+            dict.fromkeys(
+                self.site.normalize_title(self._full_name(name)) for name in names
+            )
+        )
+        if with_text or "apihighlimits" not in self.site.rights:
+            size = 50
+        else:
+            size = 500
+        batches = (names[i : i + size] for i in range(0, len(names), size))
+
+        pending = set()
+        try:
+            for batch in batches:
+                pending.add(asyncio.ensure_future(self._load_batch(batch, with_text)))
+                if len(pending) < concurrency:
+                    continue
+                done, pending = await asyncio.wait(
+                    pending, return_when=asyncio.FIRST_COMPLETED
+                )
+                for task in done:
+                    for page in task.result():
+                        yield page
+            for task in asyncio.as_completed(pending):
+                for page in await task:
+                    yield page
+        finally:
+            for task in pending:
+                task.cancel()
+
+    async def _load_batch(self, names, with_text):
+        kwargs = {"titles": "|".join(names), "inprop": "protection"}
+        if with_text:
+            kwargs.update(
+                prop="info|revisions", rvprop="content|timestamp|ids", rvslots="main"
+            )
+        else:
+            kwargs["prop"] = "info"
+        infos, query = await self.site.query_pages(**kwargs)
+
+        pages = []
+        for info in infos:
+            revisions = info.pop("revisions", None)
+            page = await self.make_page(
+                self.site, info.get("ns", 0), info.get("title", u""), info
+            )
+            if revisions:
+                page._cache_revision(revisions)
+            pages.append(page)
+        return pages
+
+    def _full_name(self, name):
+        if self.namespace != 0:
+            return u"{namespace}:{name}".format(
+                namespace=self.site.namespaces[self.namespace],
+                name=name,
+            )
+        return name
+
+    @staticmethod
+    async def make_page(site, namespace, name, info=None):
+        """Create a Category, Image or Page object, according to `namespace`."""
+        if namespace == 6:
+            return await aiomwclient.image.Image().init(site, name, info)
+        elif namespace == 14:
+            return await Category().init(site, name, info)
+        else:
+            return await aiomwclient.page.Page().init(site, name, info)
+
+    @staticmethod
+    def page_from_info(site, info):
+        """Create a Category, Image or Page object from its info in a query
+        response, according to its namespace, without a request."""
+        namespace = info.get("ns", 0)
         if namespace == 6:
-            return await aiomwclient.image.Image().init(self.site, full_page_name, info)
+            return aiomwclient.image.Image.from_info(site, info)
         elif namespace == 14:
-            return await Category().init(self.site, full_page_name, info)
+            return Category.from_info(site, info)
         else:
-            return await aiomwclient.page.Page().init(self.site, full_page_name, info)
+            return aiomwclient.page.Page.from_info(site, info)
 
     def guess_namespace(self, name):
         """Guess the namespace from name
 
-        If name starts with any of the site's namespaces' names or
-        default_namespaces, use that.  Else, return zero.
+        If name starts with any of the site's namespaces' names, their canonical
+        names, aliases or default_namespaces, in any case and with spaces or
+        underscores, use that.  Else, return zero.
 
         Args:
             name (str): The pagename as a string (having `.startswith`)
@@ -306,17 +755,7 @@ class PageList(GeneratorList):
         Returns:
             The id of the guessed namespace or zero.
         """
-        for ns in self.site.namespaces:
-            if ns == 0:
-                continue
-            namespace = u"%s:" % self.site.namespaces[ns].replace(" ", "_")
-            if name.startswith(namespace):
-                return ns
-            elif ns in self.site.default_namespaces:
-                namespace = u"%s:" % self.site.default_namespaces[ns].replace(" ", "_")
-                if name.startswith(namespace):
-                    return ns
-        return 0
+        return self.site.resolve_namespace(name)[0]
 
 
 class PageProperty(List):
@@ -326,9 +765,11 @@ class PageProperty(List):
         )
         self.page = page
         self.generator = "prop"
+        # The items are nested in the page, which can't be picked out while parsing
+        self.stream = False
 
     def set_iter(self, data):
-        for page in iter(data["query"]["pages"].values()):
+        for page in iter_pages(data["query"]["pages"]):
             if page["title"] == self.page.name:
                 self._iter = iter(page.get(self.list_name, ()))
                 return
@@ -348,3 +789,453 @@ class RevisionsIterator(PageProperty):
         if "rvstartid" in self.args and "rvstart" in self.args:
             del self.args["rvstart"]
         return await super(RevisionsIterator, self).load_chunk()
+
+
+async def merge(*lists, key="timestamp", reverse=False):
+    """Merge lists that are each sorted, such as several `usercontributions`
+    listings, into one sorted stream.
+
+    The lists are consumed a chunk at a time as their items are needed, so about
+    one chunk per list is held in memory.
+
+    Example:
+        >>> contributions = [site.usercontributions(user) for user in users]
+        >>> async for contribution in merge(*contributions, reverse=True):
+        ...     print(contribution['timestamp'], contribution['user'])
+
+    Args:
+        *lists: The lists, or other asynchronous iterables.
+        key (Union[str, Callable]): The member of the items to sort by, or a
+            function returning the value to sort an item by.
+        reverse (bool): Whether the lists are sorted in descending order, as
+            listings with `dir='older'` are.
+    """
+    if not callable(key):
+        key = operator.itemgetter(key)
+    sources = [_batches(lst) for lst in lists]
+    heap = []
+
+    def push(index, batch):
+        item = batch.pop()
+        sort_key = _Descending(key(item)) if reverse else key(item)
+        heapq.heappush(heap, (sort_key, index, item, batch))
+
+    async def refill(index):
+        # Pushes the first item of the next non-empty batch of a list, if any
+        async for batch in sources[index]:
+            if batch:
+                # Popped from the end
+                batch.reverse()
+                push(index, batch)
+                return
+
+    try:
+        await asyncio.gather(*[refill(index) for index in range(len(sources))])
+        while heap:
+            sort_key, index, item, batch = heapq.heappop(heap)
+            yield item
+            if batch:
+                push(index, batch)
+            else:
+                await refill(index)
+    finally:
+        for source in sources:
+            await source.aclose()
+        for lst in lists:
+            if isinstance(lst, List):
+                await lst.aclose()
+
+
+async def _batches(iterable):
+    # The chunks of a list, as fresh lists
+    if hasattr(iterable, "batches"):
+        async for batch in iterable.batches():
+            yield list(batch)
+    else:
+        async for item in iterable:
+            yield [item]
+
+
+class _Descending(object):
+    # Inverts the order of a sort key
+    __slots__ = ("value",)
+
+    def __init__(self, value):
+        self.value = value
+
+    def __lt__(self, other):
+        return other.value < self.value
+
+    def __eq__(self, other):
+        return self.value == other.value
+
+
+class ShardedScan(object):
+    """Base class of listings split into shards that are loaded concurrently.
+
+    Subclasses create the shards in `make_shards`. Each shard is a `List`
+    following its own continuation chain.
+
+    A shard stops loading once `buffer` of its chunks are waiting to be yielded,
+    and keeps its place among the `concurrency` shards being loaded until they
+    are, so at most `concurrency` times `buffer` chunks are held in memory.
+
+    Args:
+        ordered (bool): Yield the items shard after shard, in the order of the
+            shards. Later shards then fill their buffers until their turn.
+            Otherwise, items are yielded as they are loaded.
+        concurrency (int): The number of shards loaded at the same time, or None
+            for all of them.
+    """
+
+    buffer = 2
+
+    def __init__(self, ordered=True, concurrency=None):
+        self.ordered = ordered
+        self.concurrency = concurrency
+
+    def __aiter__(self):
+        return self.iterate()
+
+    async def make_shards(self):
+        """Create the shards.
+
+        Returns:
+            list: Pairs of a shard list and the title at which it starts if the
+            previous shard ends with the same title, else None.
+        """
+        raise NotImplementedError
+
+    async def iterate(self):
+        """Iterate over the items of all shards."""
+        shards = await self.make_shards()
+        concurrency = self.concurrency or len(shards)
+        semaphore = asyncio.Semaphore(concurrency)
+        if self.ordered:
+            queues = [asyncio.Queue(maxsize=self.buffer) for shard in shards]
+        else:
+            queues = [asyncio.Queue(maxsize=self.buffer * concurrency)] * len(shards)
+
+        tasks = [
+            asyncio.ensure_future(self._load_shard(shard, boundary, queue, semaphore))
+            for (shard, boundary), queue in zip(shards, queues)
+        ]
+        try:
+            if self.ordered:
+                for queue in queues:
+                    async for item in self._drain(queue, 1):
+                        yield item
+            else:
+                async for item in self._drain(queues[0], len(tasks)):
+                    yield item
+        finally:
+            for task in tasks:
+                task.cancel()
+
+    def is_boundary(self, item, boundary):
+        """Whether `item` is the item at `boundary`, which the previous shard
+        returns too."""
+        return False
+
+    async def _load_shard(self, shard, boundary, queue, semaphore):
+        try:
+            async with semaphore:
+                first = True
+                async for batch in shard.batches():
+                    if first and boundary is not None:
+                        # Already yielded by the previous shard. Generator chunks
+                        # are not in title order, so look through the whole chunk
+                        for index, item in enumerate(batch):
+                            if self.is_boundary(item, boundary):
+                                batch = batch[:index] + batch[index + 1 :]
+                                break
+                    first = False
+                    if batch:
+                        await queue.put((batch, None))
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            await queue.put((None, e))
+            return
+        await queue.put((None, None))
+
+    @staticmethod
+    async def _drain(queue, shards):
+        # Yields the items of `shards` shards loading into `queue`
+        while shards:
+            batch, error = await queue.get()
+            if error is not None:
+                raise error
+            if batch is None:
+                shards -= 1
+                continue
+            for item in batch:
+                yield item
+
+
+class ShardedList(ShardedScan):
+    """Scan of an alphabetical listing, split into title ranges that are loaded
+    concurrently.
+
+    Each shard is a list of `list_class` for the titles from one boundary to the
+    next, following its own continuation chain. The boundaries are either given,
+    or picked from a random sample of `namespace` when only the number of shards
+    is. Only ascending scans can be sharded.
+
+    Example:
+        >>> pages = ShardedList(
+        ...     List, site, 'allpages', 'ap', {'return_values': 'title'},
+        ...     shards=['F', 'M', 'S'],
+        ... )
+        >>> async for title in pages:
+        ...     print(title)
+
+    Args:
+        list_class (type): The class of the shard lists, `List` or `GeneratorList`.
+        site (Site): The site.
+        list_name (str): The name of the list module, such as 'allpages'.
+        prefix (str): The parameter prefix of the list module, such as 'ap'.
+        list_args (dict): The keyword arguments of the shard lists. Their
+            `from` and `to` parameters limit the whole scan.
+        shards (Union[int, Iterable[str]]): The number of shards, or the titles
+            at which the scan is split.
+        namespace (int): The namespace the titles are in.
+        ordered (bool): Yield the items in the order of the listing, see
+            `ShardedScan`.
+        concurrency (int): The number of shards loaded at the same time, or None
+            for all of them.
+        key (Callable): Returns the title of an item. An item at a boundary is
+            returned by the shards on both sides of it, and is only yielded once.
+    """
+
+    def __init__(
+        self,
+        list_class,
+        site,
+        list_name,
+        prefix,
+        list_args,
+        shards,
+        namespace=0,
+        ordered=True,
+        concurrency=None,
+        key=None,
+    ):
+        super(ShardedList, self).__init__(ordered, concurrency)
+        self.list_class = list_class
+        self.site = site
+        self.list_name = list_name
+        self.prefix = prefix
+        self.list_args = list_args
+        self.shards = shards
+        self.namespace = int(namespace or 0)
+        self.key = key or self.title_key
+
+        pfx = List.get_prefix(prefix, issubclass(list_class, GeneratorList))
+        self.from_param = pfx + "from"
+        self.to_param = pfx + "to"
+        if list_args.get(pfx + "dir") == "descending":
+            raise ValueError("Only ascending listings can be sharded")
+
+    def __repr__(self):
+        return "<ShardedList object '%s' for %s>" % (self.list_name, self.site)
+
+    async def make_shards(self):
+        boundaries = await self.boundaries()
+        edges = (
+            [self.list_args.get(self.from_param)]
+            + boundaries
+            + [self.list_args.get(self.to_param)]
+        )
+        return [
+            (self.make_shard(edges[i], edges[i + 1]), edges[i] if i else None)
+            for i in range(len(edges) - 1)
+        ]
+
+    async def boundaries(self):
+        """The titles at which the scan is split, inside its `from` and `to`."""
+        if isinstance(self.shards, int):
+            boundaries = await self.sample_boundaries(self.shards)
+        else:
+            boundaries = sorted(set(self.shards), key=self._sort_key)
+
+        start = self.list_args.get(self.from_param)
+        end = self.list_args.get(self.to_param)
+        return [
+            boundary
+            for boundary in boundaries
+            if (start is None or self._sort_key(boundary) > self._sort_key(start))
+            and (end is None or self._sort_key(boundary) < self._sort_key(end))
+        ]
+
+    async def sample_boundaries(self, shards, sample_size=None):
+        """Pick boundaries splitting the namespace into `shards` shards of about
+        the same size, from a random sample of its titles.
+
+        Args:
+            shards (int): The number of shards.
+            sample_size (int): The number of titles to sample. Defaults to ten per
+                shard.
+        """
+        sample_size = sample_size or 10 * shards
+        sample = List(
+            self.site,
+            "random",
+            "rn",
+            limit=min(sample_size, 10),
+            max_items=sample_size,
+            rnnamespace=str(self.namespace),
+        )
+        titles = sorted(
+            {self._strip_namespace(item["title"]) async for item in sample},
+            key=self._sort_key,
+        )
+        if not titles:
+            return []
+        return [titles[len(titles) * i // shards] for i in range(1, shards)]
+
+    def make_shard(self, start, end):
+        """Create the list of the titles from `start` to `end`, both included."""
+        list_args = dict(self.list_args)
+        list_args.pop(self.from_param, None)
+        list_args.pop(self.to_param, None)
+        if start is not None:
+            list_args[self.from_param] = start
+        if end is not None:
+            list_args[self.to_param] = end
+        return self.list_class(self.site, self.list_name, self.prefix, **list_args)
+
+    def title_key(self, value):
+        """The title of an item, without its namespace."""
+        if isinstance(value, (aiomwclient.page.Page, aiomwclient.page.LazyPage)):
+            return value.page_title
+        if isinstance(value, tuple):
+            value = value[0]
+        if isinstance(value, dict):
+            for member in ("title", "name", "category", "*"):
+                if member in value:
+                    value = value[member]
+                    break
+        return self._strip_namespace(value)
+
+    def _strip_namespace(self, title):
+        if self.namespace and isinstance(title, str):
+            namespace, rest = self.site.resolve_namespace(title)
+            if namespace == self.namespace:
+                return rest
+        return title
+
+    @staticmethod
+    def _sort_key(title):
+        # Titles are sorted as stored in the database, with underscores
+        return title.replace(" ", "_")
+
+    def is_boundary(self, item, boundary):
+        return self._sort_key(self.key(item)) == self._sort_key(boundary)
+
+
+class TimeShardedList(ShardedScan):
+    """Listing in timestamp order, split into disjoint time windows that are
+    loaded concurrently.
+
+    The range from `start` to `end` is cut into windows of `window` seconds. Both
+    ends of a window are included in its query, so consecutive windows are one
+    second apart and no item is returned twice. The windows are concatenated in
+    the direction of the listing, which gives the same order as a heap merge of
+    the windows by timestamp.
+
+    Example:
+        >>> changes = TimeShardedList(
+        ...     List, site, 'recentchanges', 'rc',
+        ...     {'rcstart': '2020-01-31T23:59:59Z', 'rcend': '2020-01-01T00:00:00Z'},
+        ...     window=86400, concurrency=8,
+        ... )
+
+    Args:
+        list_class (type): The class of the window lists.
+        site (Site): The site.
+        list_name (str): The name of the list module, such as 'recentchanges'.
+        prefix (str): The parameter prefix of the list module, such as 'rc'.
+        list_args (dict): The keyword arguments of the window lists. Their `start`
+            and `end` parameters, which must be set, give the whole range.
+        window (Union[float, datetime.timedelta]): The length of the windows.
+        ordered (bool): Yield the items in timestamp order, see `ShardedScan`.
+        concurrency (int): The number of windows loaded at the same time, or None
+            for all of them. Windows waiting for their turn stop loading after a
+            few chunks, see `ShardedScan`.
+    """
+
+    def __init__(
+        self,
+        list_class,
+        site,
+        list_name,
+        prefix,
+        list_args,
+        window,
+        ordered=True,
+        concurrency=None,
+    ):
+        super(TimeShardedList, self).__init__(ordered, concurrency)
+        self.list_class = list_class
+        self.site = site
+        self.list_name = list_name
+        self.prefix = prefix
+        self.list_args = list_args
+        if isinstance(window, datetime.timedelta):
+            window = window.total_seconds()
+        self.window = max(1, int(window))
+
+        self.start_param = prefix + "start"
+        self.end_param = prefix + "end"
+        if list_args.get(self.start_param) is None:
+            raise ValueError("A start time is needed to split a listing in windows")
+        if list_args.get(self.end_param) is None:
+            raise ValueError("An end time is needed to split a listing in windows")
+        self.newer = list_args.get(prefix + "dir") == "newer"
+
+    def __repr__(self):
+        return "<TimeShardedList object '%s' for %s>" % (self.list_name, self.site)
+
+    async def make_shards(self):
+        start = self.to_epoch(self.list_args[self.start_param])
+        end = self.to_epoch(self.list_args[self.end_param])
+        step = self.window if self.newer else -self.window
+        shards = []
+        for window_start in range(start, end + (1 if self.newer else -1), step):
+            window_end = window_start + step - (1 if self.newer else -1)
+            if self.newer:
+                window_end = min(window_end, end)
+            else:
+                window_end = max(window_end, end)
+            shards.append((self.make_shard(window_start, window_end), None))
+        return shards
+
+    def make_shard(self, start, end):
+        """Create the list of the items from `start` to `end`, both included, given
+        as seconds since the epoch."""
+        list_args = dict(self.list_args)
+        list_args[self.start_param] = self.format_time(start)
+        list_args[self.end_param] = self.format_time(end)
+        return self.list_class(self.site, self.list_name, self.prefix, **list_args)
+
+    @staticmethod
+    def to_epoch(value):
+        """Convert a timestamp to whole seconds since the epoch.
+
+        Args:
+            value: A MediaWiki timestamp string, a `time.struct_time` in UTC, a
+                `datetime.datetime`, or a number of seconds since the epoch.
+        """
+        if isinstance(value, str):
+            return parse_timestamp(value, "epoch")
+        if isinstance(value, datetime.datetime):
+            value = value.utctimetuple()
+        if isinstance(value, time.struct_time):
+            return calendar.timegm(value)
+        return int(value)
+
+    @staticmethod
+    def format_time(seconds):
+        """Format seconds since the epoch as a MediaWiki timestamp."""
+        return time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime(seconds))
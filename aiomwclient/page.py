@@ -2,7 +2,7 @@ import time
 
 import aiomwclient.errors
 import aiomwclient.listing
-from aiomwclient.util import parse_timestamp
+from aiomwclient.util import content_value, iter_pages, parse_timestamp
 
 
 class Page(object):
@@ -10,6 +10,8 @@ class Page(object):
         if type(name) is type(self):
             self.__dict__.update(name.__dict__)
             return
+        if type(name) is str and name:
+            name = site.normalize_title(name)
         self.site = site
         self.name = name
         self._textcache = {}
@@ -24,15 +26,47 @@ class Page(object):
                 prop = "info"
                 extra_props = ()
 
-            if type(name) is int:
-                info = await self.site.get(
-                    "query", prop=prop, pageids=name, inprop="protection", *extra_props
-                )
-            else:
-                info = await self.site.get(
-                    "query", prop=prop, titles=name, inprop="protection", *extra_props
-                )
-            info = next(iter(info["query"]["pages"].values()))
+            info = None
+            if self.site.page_loader is not None:
+                info = await self.site.page_loader.load(name, prop, extra_props)
+
+            if info is None:
+                if type(name) is int:
+                    info = await self.site.get(
+                        "query",
+                        prop=prop,
+                        pageids=name,
+                        inprop="protection",
+                        *extra_props
+                    )
+                else:
+                    info = await self.site.get(
+                        "query",
+                        prop=prop,
+                        titles=name,
+                        inprop="protection",
+                        *extra_props
+                    )
+                info = next(iter(iter_pages(info["query"]["pages"])))
+        self._set_info(info)
+        return self
+
+    @classmethod
+    def from_info(cls, site, info):
+        """Create a page from its info in a query response, without a request.
+
+        Args:
+            site (Site): The site of the page.
+            info (dict): The page info, with at least `prop=info`.
+        """
+        page = cls()
+        page.site = site
+        page.name = info.get("title", u"")
+        page._textcache = {}
+        page._set_info(info)
+        return page
+
+    def _set_info(self, info):
         self._info = info
 
         if "invalid" in info:
@@ -41,7 +75,10 @@ class Page(object):
         self.namespace = info.get("ns", 0)
         self.name = info.get("title", u"")
         if self.namespace:
-            self.page_title = self.strip_namespace(self.name)
+            self.page_title = self.strip_namespace(self.name, self.site)
+            if self.page_title == self.name:
+                # A namespace the site doesn't know, as before site_init
+                self.page_title = self.strip_namespace(self.name)
         else:
             self.page_title = self.name
 
@@ -66,8 +103,6 @@ class Page(object):
         self.last_rev_time = None
         self.edit_time = None
 
-        return self
-
     async def redirects_to(self):
         """ Get the redirect target page, or None if the page is not a redirect."""
         info = await self.site.get(
@@ -96,14 +131,21 @@ class Page(object):
         return self.name
 
     @staticmethod
-    def strip_namespace(title):
+    def strip_namespace(title, site=None):
+        """Remove the namespace prefix from a title.
+
+        Without `site`, everything up to the first colon is removed. With it, only
+        a known namespace prefix is, as recognized by `Site.resolve_namespace`.
+        """
+        if site is not None:
+            return site.resolve_namespace(title)[1]
         if title[0] == ":":
             title = title[1:]
         return title[title.find(":") + 1 :]
 
     @staticmethod
     def normalize_title(title):
-        # TODO: Make site dependent
+        # Site independent, with underscores; see Site.normalize_title
         title = title.strip()
         if title[0] == ":":
             title = title[1:]
@@ -136,7 +178,8 @@ class Page(object):
         default, results will be cached and if you call text() again
         with the same section and expandtemplates the result will come
         from the cache. The cache is stored on the instance, so it
-        lives as long as the instance does.
+        lives as long as the instance does. If the site has a `text_cache`,
+        texts are also looked up there by revision, and added to it.
 
         Args:
             section (int): Section number, to only get text from a single section.
@@ -154,18 +197,35 @@ class Page(object):
         key = hash((section, expandtemplates))
         if cache and key in self._textcache:
             return self._textcache[key]
-
+        text_cache = self.site.text_cache if cache else None
+        if text_cache is not None and self.revision:
+            entry = text_cache.get((self.revision, slot, section, expandtemplates))
+            if entry is not None:
+                # Set up edit conflict detection as if the text had been fetched
+                text, self.last_rev_time = entry
+                if not expandtemplates:
+                    self.edit_time = time.gmtime()
+                self._textcache[key] = text
+                return text
+
+        # Edits need the timestamp as struct_time, whatever the site default
         revs = self.revisions(
-            prop="content|timestamp", limit=1, section=section, slots=slot
+            prop="content|timestamp|ids",
+            limit=1,
+            section=section,
+            slots=slot,
+            timestamps="struct_time",
         )
+        revid = None
         try:
             rev = await revs.__anext__()
             if "slots" in rev:
-                text = rev["slots"][slot]["*"]
+                text = content_value(rev["slots"][slot], "content")
             else:
-                text = rev["*"]
+                text = content_value(rev, "content")
             self.last_rev_time = rev["timestamp"]
-        except StopIteration:
+            revid = rev.get("revid")
+        except StopAsyncIteration:
             text = u""
             self.last_rev_time = None
         if not expandtemplates:
@@ -173,12 +233,33 @@ class Page(object):
         else:
             # The 'rvexpandtemplates' option was removed in MediaWiki 1.32, so we have to
             # make an extra API call, see https://github.com/mwclient/mwclient/issues/214
-            text = self.site.expandtemplates(text)
+            text = await self.site.expandtemplates(text)
 
         if cache:
             self._textcache[key] = text
+            if text_cache is not None and revid:
+                text_cache.set(
+                    (revid, slot, section, expandtemplates), text, self.last_rev_time
+                )
         return text
 
+    def _cache_revision(self, revisions, slot="main"):
+        """Put the content of the current revision, as included in the page info
+        by `prop=revisions`, in the text cache."""
+        rev = revisions[0]
+        if "slots" in rev:
+            rev = dict(rev, **rev["slots"][slot])
+        if "content" not in rev and "*" not in rev:
+            return
+        self.last_rev_time = parse_timestamp(rev.get("timestamp"))
+        self.edit_time = time.gmtime()
+        text = content_value(rev, "content")
+        self._textcache[hash((None, False))] = text
+        if self.site.text_cache is not None and rev.get("revid"):
+            self.site.text_cache.set(
+                (rev["revid"], slot, None, False), text, self.last_rev_time
+            )
+
     async def save(self, *args, **kwargs):
         """Alias for edit, for maintaining backwards compatibility."""
         return await self.edit(*args, **kwargs)
@@ -386,11 +467,16 @@ class Page(object):
         redirect=False,
         limit=None,
         generator=True,
+        props=None,
+        prop_args=None,
     ):
         """List pages that link to the current page, similar to Special:Whatlinkshere.
 
         API doc: https://www.mediawiki.org/wiki/API:Backlinks
 
+        With `generator`, additional properties of the pages can be requested with
+        `props` and `prop_args`, see `GeneratorList`.
+
         """
         prefix = aiomwclient.listing.List.get_prefix("bl", generator)
         kwargs = dict(
@@ -403,12 +489,15 @@ class Page(object):
         if redirect:
             kwargs["%sredirect" % prefix] = "1"
         kwargs[prefix + "title"] = self.name
+        kwargs.update(
+            aiomwclient.listing.List.get_prop_kwargs(generator, props, prop_args)
+        )
 
         return aiomwclient.listing.List.get_list(generator)(
             self.site, "backlinks", "bl", limit=limit, return_values="title", **kwargs
         )
 
-    def categories(self, generator=True, show=None):
+    def categories(self, generator=True, show=None, props=None, prop_args=None):
         """List categories used on the current page.
 
         API doc: https://www.mediawiki.org/wiki/API:Categories
@@ -417,6 +506,9 @@ class Page(object):
             generator (bool): Return generator (Default: True)
             show (str): Set to 'hidden' to only return hidden categories
                 or '!hidden' to only return non-hidden ones.
+            props (Iterable[str]): Additional properties of the category pages, see
+                `GeneratorList`.
+            prop_args (dict): Parameters of the additional properties.
 
         Returns:
             aiomwclient.listings.PagePropertyGenerator
@@ -426,7 +518,7 @@ class Page(object):
 
         if generator:
             return aiomwclient.listing.PagePropertyGenerator(
-                self, "categories", "cl", **kwargs
+                self, "categories", "cl", props=props, prop_args=prop_args, **kwargs
             )
         else:
             # TODO: return sortkey if wanted
@@ -434,7 +526,15 @@ class Page(object):
                 self, "categories", "cl", return_values="title", **kwargs
             )
 
-    def embeddedin(self, namespace=None, filterredir="all", limit=None, generator=True):
+    def embeddedin(
+        self,
+        namespace=None,
+        filterredir="all",
+        limit=None,
+        generator=True,
+        props=None,
+        prop_args=None,
+    ):
         """List pages that transclude the current page.
 
         API doc: https://www.mediawiki.org/wiki/API:Embeddedin
@@ -445,6 +545,9 @@ class Page(object):
                 'redirects' or 'nonredirects'.
             limit (int): Maximum amount of pages to return per request
             generator (bool): Return generator (Default: True)
+            props (Iterable[str]): Additional properties of the pages, see
+                `GeneratorList`.
+            prop_args (dict): Parameters of the additional properties.
 
         Returns:
             aiomwclient.listings.List: Page iterator
@@ -456,6 +559,9 @@ class Page(object):
             )
         )
         kwargs[prefix + "title"] = self.name
+        kwargs.update(
+            aiomwclient.listing.List.get_prop_kwargs(generator, props, prop_args)
+        )
 
         return aiomwclient.listing.List.get_list(generator)(
             self.site, "embeddedin", "ei", limit=limit, return_values="title", **kwargs
@@ -468,17 +574,22 @@ class Page(object):
 
         """
         return aiomwclient.listing.PageProperty(
-            self, "extlinks", "el", return_values="*"
+            self,
+            "extlinks",
+            "el",
+            return_values="url" if self.site.formatversion == 2 else "*",
         )
 
-    def images(self, generator=True):
+    def images(self, generator=True, props=None, prop_args=None):
         """List files/images embedded in the current page.
 
         API doc: https://www.mediawiki.org/wiki/API:Images
 
         """
         if generator:
-            return aiomwclient.listing.PagePropertyGenerator(self, "images", "")
+            return aiomwclient.listing.PagePropertyGenerator(
+                self, "images", "", props=props, prop_args=prop_args
+            )
         else:
             return aiomwclient.listing.PageProperty(
                 self, "images", "", return_values="title"
@@ -491,7 +602,10 @@ class Page(object):
 
         """
         return aiomwclient.listing.PageProperty(
-            self, "iwlinks", "iw", return_values=("prefix", "*")
+            self,
+            "iwlinks",
+            "iw",
+            return_values=("prefix", "title" if self.site.formatversion == 2 else "*"),
         )
 
     def langlinks(self, **kwargs):
@@ -501,10 +615,21 @@ class Page(object):
 
         """
         return aiomwclient.listing.PageProperty(
-            self, "langlinks", "ll", return_values=("lang", "*"), **kwargs
+            self,
+            "langlinks",
+            "ll",
+            return_values=("lang", "title" if self.site.formatversion == 2 else "*"),
+            **kwargs
         )
 
-    def links(self, namespace=None, generator=True, redirects=False):
+    def links(
+        self,
+        namespace=None,
+        generator=True,
+        redirects=False,
+        props=None,
+        prop_args=None,
+    ):
         """List links to other pages from the current page.
 
         API doc: https://www.mediawiki.org/wiki/API:Links
@@ -519,7 +644,7 @@ class Page(object):
             kwargs["redirects"] = "1"
         if generator:
             return aiomwclient.listing.PagePropertyGenerator(
-                self, "links", "pl", **kwargs
+                self, "links", "pl", props=props, prop_args=prop_args, **kwargs
             )
         else:
             return aiomwclient.listing.PageProperty(
@@ -542,6 +667,7 @@ class Page(object):
         diffto=None,
         slots=None,
         uselang=None,
+        timestamps=None,
     ):
         """List revisions of the current page.
 
@@ -566,6 +692,8 @@ class Page(object):
             slots (str): The content slot (Mediawiki >= 1.32) to retrieve content from.
             uselang (str): Language to use for parsed edit comments and other localized
                 messages.
+            timestamps (str): How to convert the timestamps of the revisions, see
+                `aiomwclient.listing.List`. Defaults to the setting of the site.
 
         Returns:
             aiomwclient.listings.List: Revision iterator
@@ -597,10 +725,10 @@ class Page(object):
             kwargs["rvsection"] = section
 
         return aiomwclient.listing.RevisionsIterator(
-            self, "revisions", "rv", limit=limit, **kwargs
+            self, "revisions", "rv", limit=limit, timestamps=timestamps, **kwargs
         )
 
-    def templates(self, namespace=None, generator=True):
+    def templates(self, namespace=None, generator=True, props=None, prop_args=None):
         """List templates used on the current page.
 
         API doc: https://www.mediawiki.org/wiki/API:Templates
@@ -612,9 +740,86 @@ class Page(object):
         )
         if generator:
             return aiomwclient.listing.PagePropertyGenerator(
-                self, "templates", prefix, **kwargs
+                self, "templates", prefix, props=props, prop_args=prop_args, **kwargs
             )
         else:
             return aiomwclient.listing.PageProperty(
                 self, "templates", prefix, return_values="title", **kwargs
             )
+
+
+class LazyPage(object):
+    """Compact stand-in for a page yielded by a listing.
+
+    Only the site, the page info and the requested properties are stored. The
+    name, title, namespace, page id and existence of the page are read from the
+    info, and the full page object is only created, without a request, when any
+    other attribute or method is used. Revision content included in the
+    properties is put in its text cache then.
+
+    Example:
+        >>> page = LazyPage(site, {'ns': 0, 'title': 'Foo', 'pageid': 1})
+        >>> page.name  # No Page object yet
+        'Foo'
+        >>> text = await page.text()  # Acts as the full Page
+
+    Args:
+        site (Site): The site of the page.
+        info (dict): The page info from a query response.
+    """
+
+    __slots__ = ("site", "_info", "_page", "props")
+
+    def __init__(self, site, info):
+        self.site = site
+        self._info = info
+        self._page = None
+        self.props = None
+
+    @property
+    def name(self):
+        return self._info.get("title", u"")
+
+    @property
+    def page_title(self):
+        if self.namespace:
+            return Page.strip_namespace(self.name)
+        return self.name
+
+    @property
+    def namespace(self):
+        return self._info.get("ns", 0)
+
+    @property
+    def pageid(self):
+        return self._info.get("pageid", None)
+
+    @property
+    def exists(self):
+        return "missing" not in self._info
+
+    @property
+    def redirect(self):
+        return "redirect" in self._info
+
+    def materialize(self):
+        """Returns the full Page, Image or Category object of the page."""
+        if self._page is None:
+            self._page = aiomwclient.listing.PageList.page_from_info(
+                self.site, self._info
+            )
+            if self.props is not None:
+                self._page.props = self.props
+                if "revisions" in self.props:
+                    self._page._cache_revision(self.props["revisions"])
+        return self._page
+
+    def __getattr__(self, name):
+        # Unset slots and special names, as looked up by copy and pickle, are not
+        # attributes of the page
+        if name in LazyPage.__slots__ or name.startswith("__"):
+            raise AttributeError(name)
+        return getattr(self.materialize(), name)
+
+    def __repr__(self):
+        return "<LazyPage object '%s' for %s>" % (self.name.encode("utf-8"), self.site)
@@ -1,5 +1,6 @@
 import asyncio
 import logging
+import random
 
 from aiomwclient.errors import MaximumRetriesExceeded
 
@@ -21,16 +22,31 @@ class Sleepers(object):
         max_retries (int): The maximum number of retries to perform.
         retry_timeout (int): The time to sleep for each past retry.
         callback (Callable[[int, Any], None]): A callable to be called on each retry.
+        backoff (Callable[[int], float]): Computes the sleeping time from the number of
+            retries, replacing the linear `retry_timeout` schedule. See
+            `ExponentialBackoff`.
+        budget (RetryBudget): A retry budget shared by all `Sleeper` objects.
     Attributes:
         max_retries (int): The maximum number of retries to perform.
         retry_timeout (int): The time to sleep for each past retry.
         callback (callable): A callable to be called on each retry.
+        backoff (callable): Computes the sleeping time from the number of retries.
+        budget (RetryBudget): A retry budget shared by all `Sleeper` objects.
     """
 
-    def __init__(self, max_retries, retry_timeout, callback=lambda *x: None):
+    def __init__(
+        self,
+        max_retries,
+        retry_timeout,
+        callback=lambda *x: None,
+        backoff=None,
+        budget=None,
+    ):
         self.max_retries = max_retries
         self.retry_timeout = retry_timeout
         self.callback = callback
+        self.backoff = backoff
+        self.budget = budget
 
     def make(self, args=None):
         """
@@ -40,7 +56,14 @@ class Sleepers(object):
         Returns:
             Sleeper: A `Sleeper` object.
         """
-        return Sleeper(args, self.max_retries, self.retry_timeout, self.callback)
+        return Sleeper(
+            args,
+            self.max_retries,
+            self.retry_timeout,
+            self.callback,
+            self.backoff,
+            self.budget,
+        )
 
 
 class Sleeper(object):
@@ -54,20 +77,28 @@ class Sleeper(object):
         max_retries (int): The maximum number of retries to perform.
         retry_timeout (int): The time to sleep for each past retry.
         callback (callable, None]): A callable to be called on each retry. Can also be a coroutine function.
+        backoff (callable): Computes the sleeping time from the number of retries.
+        budget (RetryBudget): A retry budget shared with other `Sleeper` objects.
     Attributes:
         args (Any): Arguments to be passed to the `callback` callable.
         retries (int): The number of retries that have been performed.
         max_retries (int): The maximum number of retries to perform.
         retry_timeout (int): The time to sleep for each past retry.
         callback (callable): A callable to be called on each retry. Can also be a coroutine function.
+        backoff (callable): Computes the sleeping time from the number of retries.
+        budget (RetryBudget): A retry budget shared with other `Sleeper` objects.
     """
 
-    def __init__(self, args, max_retries, retry_timeout, callback):
+    def __init__(
+        self, args, max_retries, retry_timeout, callback, backoff=None, budget=None
+    ):
         self.args = args
         self.retries = 0
         self.max_retries = max_retries
         self.retry_timeout = retry_timeout
         self.callback = callback
+        self.backoff = backoff
+        self.budget = budget
 
     async def sleep(self, min_time=0):
         """
@@ -76,19 +107,99 @@ class Sleeper(object):
         Args:
             min_time (int): The minimum sleeping time.
         Raises:
-            MaximumRetriesExceeded: If the number of retries exceeds the maximum.
+            MaximumRetriesExceeded: If the number of retries exceeds the maximum, or
+                the shared retry budget is exhausted.
         """
         self.retries += 1
         if self.retries > self.max_retries:
             raise MaximumRetriesExceeded(self, self.args)
+        if self.budget is not None and not self.budget.withdraw():
+            raise MaximumRetriesExceeded(self, self.args)
 
         if asyncio.iscoroutinefunction(self.callback):
             await self.callback(self, self.retries, self.args)
         else:
             self.callback(self, self.retries, self.args)
 
-        timeout = self.retry_timeout * (self.retries - 1)
+        if self.backoff is not None:
+            timeout = self.backoff(self.retries)
+        else:
+            timeout = self.retry_timeout * (self.retries - 1)
         if timeout < min_time:
             timeout = min_time
         log.debug("Sleeping for %d seconds", timeout)
         await asyncio.sleep(timeout)
+
+
+class ExponentialBackoff(object):
+    """
+    A sleeping time schedule for `Sleepers` that doubles with every retry, up to a
+    maximum, with random jitter so that concurrent retries spread out.
+    Examples:
+        >>> backoff = ExponentialBackoff(base=1, cap=60)
+        >>> sleepers = Sleepers(max_retries=10, retry_timeout=1, backoff=backoff)
+    Args:
+        base (float): The sleeping time for the first retry, before jitter.
+        cap (float): The maximum sleeping time.
+        factor (float): The growth of the sleeping time with each retry.
+        jitter (float): The fraction of the sleeping time that is randomized. With the
+            default of 0.5 the time is between half and all of the computed value.
+    Attributes:
+        base (float): The sleeping time for the first retry, before jitter.
+        cap (float): The maximum sleeping time.
+        factor (float): The growth of the sleeping time with each retry.
+        jitter (float): The fraction of the sleeping time that is randomized.
+    """
+
+    def __init__(self, base=1, cap=300, factor=2, jitter=0.5):
+        self.base = base
+        self.cap = cap
+        self.factor = factor
+        self.jitter = jitter
+
+    def __call__(self, retries):
+        timeout = min(self.cap, self.base * self.factor ** (retries - 1))
+        return timeout * (1 - self.jitter * random.random())
+
+
+class RetryBudget(object):
+    """
+    Limits the number of retries across all operations sharing the budget, so that
+    a failing server isn't flooded with retries. Every retry withdraws one token and
+    every successful operation deposits `ratio` tokens, up to `max_tokens`.
+    Examples:
+        With the defaults, at most 10 retries can happen in a row, and in the long
+        run there is at most one retry per ten successful requests.
+        >>> budget = RetryBudget(ratio=0.1, max_tokens=10)
+    Args:
+        ratio (float): The number of tokens deposited per successful operation.
+        max_tokens (float): The maximum number of tokens, which is also the initial
+            number of tokens.
+    Attributes:
+        ratio (float): The number of tokens deposited per successful operation.
+        max_tokens (float): The maximum number of tokens.
+        tokens (float): The number of tokens currently available.
+    """
+
+    def __init__(self, ratio=0.1, max_tokens=10):
+        self.ratio = ratio
+        self.max_tokens = max_tokens
+        self.tokens = max_tokens
+
+    def deposit(self):
+        """
+        Records a successful operation.
+        """
+        self.tokens = min(self.max_tokens, self.tokens + self.ratio)
+
+    def withdraw(self):
+        """
+        Takes a token for a retry.
+        Returns:
+            bool: False if the budget is exhausted and the retry should not happen.
+        """
+        if self.tokens < 1:
+            log.warning("Retry budget exhausted")
+            return False
+        self.tokens -= 1
+        return True
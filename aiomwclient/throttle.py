@@ -0,0 +1,297 @@
+import asyncio
+import collections
+import logging
+
+log = logging.getLogger(__name__)
+
+
+class TokenBucket(object):
+    """
+    Limits the rate at which operations are started. Tokens are added to the bucket
+    at a constant rate, up to `burst` tokens, and every operation takes one token.
+    Operations wait in order of arrival when the bucket is empty.
+    Args:
+        rate (float): The number of tokens added per second.
+        burst (int): The maximum number of tokens the bucket can hold. Defaults to
+            one second worth of tokens.
+    Attributes:
+        rate (float): The number of tokens added per second.
+        burst (int): The maximum number of tokens the bucket can hold.
+        tokens (float): The number of tokens currently in the bucket.
+    """
+
+    def __init__(self, rate, burst=None):
+        self.rate = rate
+        self.burst = burst if burst is not None else max(1, rate)
+        self.tokens = self.burst
+        self._updated = None
+        self._lock = asyncio.Lock()
+
+    async def take(self):
+        """
+        Takes a token from the bucket, waiting for one to become available if needed.
+        """
+        async with self._lock:
+            loop = asyncio.get_event_loop()
+            while True:
+                now = loop.time()
+                if self._updated is not None:
+                    self.tokens = min(
+                        self.burst, self.tokens + (now - self._updated) * self.rate
+                    )
+                self._updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                await asyncio.sleep((1 - self.tokens) / self.rate)
+
+
+class Throttle(object):
+    """
+    Limits the number of operations in flight and, optionally, the rate at which
+    they are started. A `Throttle` is used as an asynchronous context manager around
+    each operation.
+    Examples:
+        >>> throttle = Throttle(max_concurrency=10, rate=5)
+        >>> async with throttle:
+        ...     await do_request()
+    Args:
+        max_concurrency (int): The maximum number of operations in flight, or None for
+            no limit.
+        rate (float): The maximum number of operations started per second, or None for
+            no limit.
+        burst (int): The number of operations that may be started at once after an
+            idle period. See `TokenBucket`.
+    Attributes:
+        max_concurrency (int): The maximum number of operations in flight.
+        in_flight (int): The number of operations currently in flight.
+        bucket (TokenBucket): The rate limiter, or None if the rate is not limited.
+        controller (AIMDController): Adjusts `max_concurrency` from the outcomes
+            passed to `record`, or None to keep it fixed.
+    """
+
+    def __init__(self, max_concurrency=None, rate=None, burst=None):
+        self.max_concurrency = max_concurrency
+        self.in_flight = 0
+        self.bucket = TokenBucket(rate, burst) if rate else None
+        self.controller = None
+        self._waiters = collections.deque()
+
+    async def acquire(self):
+        """
+        Waits until a new operation may be started.
+        """
+        if self.max_concurrency is None or (
+            self.in_flight < self.max_concurrency and not self._waiters
+        ):
+            self.in_flight += 1
+        else:
+            waiter = asyncio.get_event_loop().create_future()
+            self._waiters.append(waiter)
+            try:
+                await waiter
+            except asyncio.CancelledError:
+                if waiter.done() and not waiter.cancelled():
+                    # The slot was handed to us right before the cancellation
+                    self.release()
+                else:
+                    self._waiters.remove(waiter)
+                raise
+
+        if self.bucket is not None:
+            try:
+                await self.bucket.take()
+            except asyncio.CancelledError:
+                self.release()
+                raise
+
+    def release(self):
+        """
+        Marks an operation as finished, allowing a waiting one to start.
+        """
+        self.in_flight -= 1
+        self._wake()
+
+    def set_limit(self, max_concurrency):
+        """
+        Changes the maximum number of operations in flight. Operations already in
+        flight are not affected when the limit is lowered.
+        Args:
+            max_concurrency (int): The new limit, or None for no limit.
+        """
+        self.max_concurrency = max_concurrency
+        self._wake()
+
+    def record(self, latency, congested=False):
+        """
+        Reports the outcome of an operation to the controller, if there is one.
+        Args:
+            latency (float): The duration of the operation in seconds, or None if
+                unknown.
+            congested (bool): Whether the server signalled that it is overloaded.
+        """
+        if self.controller is not None:
+            self.controller.record(latency, congested)
+
+    def _wake(self):
+        while self._waiters and (
+            self.max_concurrency is None or self.in_flight < self.max_concurrency
+        ):
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                self.in_flight += 1
+                waiter.set_result(None)
+
+    async def __aenter__(self):
+        await self.acquire()
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        self.release()
+
+
+class AIMDController(object):
+    """
+    Sets the concurrency limit of a `Throttle` automatically, using additive increase
+    and multiplicative decrease. Each round of `limit` uncongested operations raises
+    the limit by `increase`. An operation that signals congestion, or that takes
+    longer than `latency_tolerance` times the smoothed latency, multiplies the limit
+    by `decrease`, at most once per round.
+    Examples:
+        >>> throttle = Throttle()
+        >>> throttle.controller = AIMDController(throttle, max_limit=32)
+    Args:
+        throttle (Throttle): The throttle whose limit is controlled.
+        min_limit (int): The lowest limit.
+        max_limit (int): The highest limit.
+        initial_limit (int): The starting limit. Defaults to `min_limit` plus a few.
+        increase (float): The amount added to the limit after each good round.
+        decrease (float): The factor applied to the limit on congestion.
+        latency_tolerance (float): How many times the smoothed latency an operation
+            may take before it counts as congestion.
+        smoothing (float): The weight of a new sample in the smoothed latency.
+    Attributes:
+        throttle (Throttle): The throttle whose limit is controlled.
+        limit (float): The current limit, before rounding.
+        latency (float): The smoothed latency of uncongested operations.
+    """
+
+    def __init__(
+        self,
+        throttle,
+        min_limit=1,
+        max_limit=64,
+        initial_limit=None,
+        increase=1,
+        decrease=0.5,
+        latency_tolerance=3,
+        smoothing=0.1,
+    ):
+        self.throttle = throttle
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.increase = increase
+        self.decrease = decrease
+        self.latency_tolerance = latency_tolerance
+        self.smoothing = smoothing
+        self.latency = None
+        if initial_limit is None:
+            initial_limit = min(max_limit, min_limit + 3)
+        self.limit = initial_limit
+        self._successes = 0
+        self._since_decrease = 0
+        throttle.set_limit(int(self.limit))
+
+    def record(self, latency, congested=False):
+        """
+        Updates the limit from the outcome of an operation.
+        Args:
+            latency (float): The duration of the operation in seconds, or None if
+                unknown.
+            congested (bool): Whether the server signalled that it is overloaded.
+        """
+        if latency is not None and not congested:
+            if self.latency is None:
+                self.latency = latency
+            elif latency > self.latency * self.latency_tolerance:
+                congested = True
+            else:
+                self.latency += self.smoothing * (latency - self.latency)
+
+        self._since_decrease += 1
+        if congested:
+            self._successes = 0
+            if self._since_decrease < self.limit:
+                # Already backed off for this round
+                return
+            self._since_decrease = 0
+            self.limit = max(self.min_limit, self.limit * self.decrease)
+            log.debug("Lowering concurrency limit to %d", self.limit)
+        else:
+            self._successes += 1
+            if self._successes < self.limit:
+                return
+            self._successes = 0
+            self.limit = min(self.max_limit, self.limit + self.increase)
+        self.throttle.set_limit(int(self.limit))
+
+
+class Gate(object):
+    """
+    Pauses all operations for a period of time. Once the pause is over, waiting
+    operations are let through one at a time, with a spacing that shrinks to zero
+    over `ramp_time` seconds, so they don't all hit the server at the same moment.
+    Examples:
+        >>> gate = Gate(ramp_time=5)
+        >>> gate.pause(10)  # Every `wait` now blocks for about ten seconds
+        >>> await gate.wait()
+    Args:
+        ramp_time (float): The number of seconds over which traffic ramps back up.
+        ramp_interval (float): The spacing between operations right after the pause.
+    Attributes:
+        ramp_time (float): The number of seconds over which traffic ramps back up.
+        ramp_interval (float): The spacing between operations right after the pause.
+        paused_until (float): Event loop time at which the current pause ends.
+    """
+
+    def __init__(self, ramp_time=5, ramp_interval=0.5):
+        self.ramp_time = ramp_time
+        self.ramp_interval = ramp_interval
+        self.paused_until = float("-inf")
+        self._last = float("-inf")
+        self._lock = asyncio.Lock()
+
+    def pause(self, seconds):
+        """
+        Pauses the gate for `seconds` seconds. A pause never shortens an ongoing one.
+        Args:
+            seconds (float): The length of the pause.
+        """
+        until = asyncio.get_event_loop().time() + seconds
+        if until > self.paused_until:
+            log.debug("Pausing all requests for %d seconds", seconds)
+            self.paused_until = until
+
+    async def wait(self):
+        """
+        Waits until the gate lets the next operation through.
+        """
+        loop = asyncio.get_event_loop()
+        if loop.time() >= self.paused_until + self.ramp_time:
+            return
+
+        async with self._lock:
+            while True:
+                now = loop.time()
+                if now < self.paused_until:
+                    await asyncio.sleep(self.paused_until - now)
+                    continue
+                elapsed = now - self.paused_until
+                if elapsed >= self.ramp_time:
+                    return
+                spacing = self.ramp_interval * (1 - elapsed / self.ramp_time)
+                if now < self._last + spacing:
+                    await asyncio.sleep(self._last + spacing - now)
+                    continue
+                self._last = now
+                return
@@ -1,19 +1,200 @@
 import time
 import io
+import json
+from collections import OrderedDict
+from datetime import datetime, timedelta, timezone
+from email.utils import parsedate_to_datetime
+from functools import partial
 
+try:
+    import orjson
+except ImportError:
+    orjson = None
 
-def parse_timestamp(t):
+try:
+    import ijson
+except ImportError:
+    ijson = None
+
+_EPOCH = datetime(1970, 1, 1)
+_SECOND = timedelta(seconds=1)
+
+
+def parse_timestamp(t, returns="struct_time"):
     """Parses a string containing a timestamp.
 
+    Timestamps in the format used by MediaWiki, such as 2020-01-02T03:04:05Z, are
+    parsed with `datetime.fromisoformat`, which is much faster than
+    `time.strptime`.
+
     Args:
         t (str): A string containing a timestamp.
+        returns (str): The type of the result: "struct_time", "datetime" for a
+            timezone-aware `datetime.datetime` in UTC, or "epoch" for the number
+            of seconds since the epoch.
 
     Returns:
-        time.struct_time: A timestamp.
+        Union[time.struct_time, datetime.datetime, int]: A timestamp. The zero
+        timestamp of MediaWiki gives a zero struct_time, None or 0.
     """
     if t is None or t == '0000-00-00T00:00:00Z':
+        if returns == "datetime":
+            return None
+        if returns == "epoch":
+            return 0
         return time.struct_time((0, 0, 0, 0, 0, 0, 0, 0, 0))
-    return time.strptime(t, '%Y-%m-%dT%H:%M:%SZ')
+
+    if len(t) == 20 and t[19] == "Z":
+        value = datetime.fromisoformat(t[:19])
+    else:
+        value = datetime.strptime(t, '%Y-%m-%dT%H:%M:%SZ')
+
+    if returns == "datetime":
+        return value.replace(tzinfo=timezone.utc)
+    if returns == "epoch":
+        return (value - _EPOCH) // _SECOND
+    return value.timetuple()
+
+
+def iter_pages(pages):
+    """Iterates over the pages of a query response.
+
+    Args:
+        pages: The "pages" member of the response, a dict keyed by page id in the
+            legacy format and a list with formatversion=2.
+
+    Returns:
+        An iterable of page dicts.
+    """
+    if isinstance(pages, dict):
+        return pages.values()
+    return pages
+
+
+def merge_page(page, update):
+    """Merges page info from a continued query into the info received before.
+
+    Lists, such as revisions or categories, are extended and other values are
+    replaced.
+
+    Args:
+        page (dict): The page info received before, which is updated.
+        update (dict): The page info from the continued query.
+    """
+    for key, value in update.items():
+        if isinstance(value, list) and isinstance(page.get(key), list):
+            page[key].extend(value)
+        else:
+            page[key] = value
+
+
+def content_value(value, name):
+    """Returns the content of an API result object.
+
+    Args:
+        value (dict): The result object.
+        name (str): The key of the content with formatversion=2. The legacy format
+            always uses "*".
+    """
+    if name in value:
+        return value[name]
+    return value["*"]
+
+
+def parse_retry_after(value):
+    """Parses the value of a Retry-After header.
+
+    Args:
+        value (str): Either a number of seconds or an HTTP date.
+
+    Returns:
+        float: The number of seconds to wait, or None if the value is missing or
+            can't be parsed.
+    """
+    if value is None:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        date = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    if date.tzinfo is None:
+        date = date.replace(tzinfo=timezone.utc)
+    return max(0.0, (date - datetime.now(timezone.utc)).total_seconds())
+
+
+def json_decoder(ordered=False):
+    """Returns the function used to decode API responses.
+
+    orjson is used when it is installed, the standard json module otherwise.
+
+    Args:
+        ordered (bool): Decode objects into OrderedDicts. This always uses the
+            standard json module, which is considerably slower.
+
+    Returns:
+        callable: A function taking the response body as bytes or str.
+    """
+    if ordered:
+        return partial(json.loads, object_pairs_hook=OrderedDict)
+    if orjson is not None:
+        return orjson.loads
+    return json.loads
+
+
+async def iter_json_members(content, path, rest):
+    """Incrementally parses a JSON document, yielding the members of the array or
+    object at `path` as soon as each of them has been read.
+
+    Requires the ijson package.
+
+    Args:
+        content: The document, as an object with an asynchronous `read` method,
+            such as `aiohttp.ClientResponse.content`.
+        path (tuple): The keys leading to the array or object.
+        rest (dict): Filled with the rest of the document, without the array or
+            object at `path`, once it has been read completely.
+
+    Yields:
+        The members of the array, or the values of the object.
+    """
+    if ijson is None:
+        raise ImportError("Streaming API responses requires the ijson package")
+
+    target = ".".join(path)
+    rest_builder = ijson.ObjectBuilder()
+    in_target = False
+    builder = None
+    depth = 0
+    async for prefix, event, value in ijson.parse_async(content, use_float=True):
+        if not in_target:
+            if prefix == target and event in ("start_map", "start_array"):
+                in_target = True
+            else:
+                rest_builder.event(event, value)
+            continue
+
+        if builder is None:
+            if event == "map_key":
+                continue
+            if event in ("end_map", "end_array"):
+                in_target = False
+                continue
+            builder = ijson.ObjectBuilder()
+        builder.event(event, value)
+        if event in ("start_map", "start_array"):
+            depth += 1
+        elif event in ("end_map", "end_array"):
+            depth -= 1
+        if depth == 0:
+            yield builder.value
+            builder = None
+
+    if hasattr(rest_builder, "value"):
+        rest.update(rest_builder.value)
 
 
 def read_in_chunks(stream, chunk_size):
@@ -31,5 +31,6 @@ setup(
     license="MIT",
     packages=["aiomwclient"],
     install_requires=["aiohttp"],
+    extras_require={"orjson": ["orjson"], "stream": ["ijson"]},
     zip_safe=True,
 )